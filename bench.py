@@ -0,0 +1,117 @@
+import argparse, csv, io, json, os, random, subprocess, sys, tempfile, time, tracemalloc
+from project import *
+
+def scaled_csv(source: str, path: str, replicate: int=1, extra: int=0, seed: int=0):
+# Fonction qui écrit une version agrandie d'un CSV : lignes répétées et attributs synthétiques ajoutés
+    rng = random.Random(seed)
+    with open(source, encoding='UTF-8') as file:
+        rows = list(csv.reader(file))
+    header, rows = rows[0], [row for row in rows[1:] if row]
+    with open(path, "w", encoding='UTF-8', newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(header + [f"synthetic-{i}" for i in range(extra)])
+        for _ in range(replicate):
+            for row in rows:
+                writer.writerow(row + [f"v{rng.randrange(4)}" for _ in range(extra)])
+    return len(rows) * replicate
+
+def measure(function, repeat: int):
+# Fonction qui retourne le meilleur temps sur repeat exécutions et le pic mémoire d'une exécution
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start() # Mesure séparée : tracemalloc ralentit l'exécution
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+def cases(path: str):
+# Fonction qui retourne les opérations mesurées et le nombre d'éléments traités par chacune
+    dataset = load_dataset(path)
+    tree = build_decision_tree(dataset)
+    compiled = compile_tree(tree, dataset)
+    rows = list(dataset)
+    cache = path + ".cache"
+    load_dataset(path, cache=cache) # Écriture du cache avant de mesurer sa lecture
+    model = path + ".model"
+    save_model(compiled, model)
+    attribute = dataset.attributes_[0]
+    nodes = len(compiled.features_) # Les exports et le chargement du modèle sont mesurés en noeuds par seconde
+    schema = get_schema(dataset.attributes_)
+    mushrooms = [Mushroom(row.is_edible(), schema, [row.get_attribute(a) for a in dataset.attributes_]) for row in rows]
+    modules = {} # is_edible des modules générés par to_python et to_python_fast
+    for name, fast in (("default", False), ("fast", True)):
+        script = os.path.join(os.path.dirname(path), f"decision_tree_{name}.py")
+        to_python(tree, script, fast=fast, dataset=dataset)
+        namespace = {}
+        with open(script, encoding='UTF-8') as file:
+            exec(file.read(), namespace)
+        modules[name] = namespace["is_edible"]
+    return [
+        ("load_dataset", lambda: load_dataset(path), len(dataset)),
+        ("load_dataset_cached", lambda: load_dataset(path, cache=cache), len(dataset)),
+        ("load_model", lambda: load_model(model), nodes),
+        ("get_information_gain", lambda: get_information_gain(dataset, attribute), len(dataset)),
+        ("get_best_attribute", lambda: get_best_attribute(dataset), len(dataset)),
+        ("build_decision_tree", lambda: build_decision_tree(dataset), len(dataset)),
+        ("is_edible", lambda: [is_edible(tree, row) for row in rows], len(rows)),
+        ("compiled_is_edible", lambda: [compiled.is_edible(row) for row in rows], len(rows)),
+        ("is_edible_batch", lambda: is_edible_batch(compiled, dataset), len(dataset)),
+        ("to_python_module", lambda: list(map(modules["default"], mushrooms)), len(mushrooms)),
+        ("to_python_fast_module", lambda: list(map(modules["fast"], mushrooms)), len(mushrooms)),
+        ("display", lambda: display(tree, io.StringIO()), nodes),
+        ("boolean_tree", lambda: boolean_tree(tree, io.StringIO()), nodes),
+        ("to_python", lambda: to_python(tree, os.path.join(os.path.dirname(path), "decision_tree.py")), nodes),
+    ]
+
+def run(source: str, scales: list[int], extras: list[int], repeat: int, only: list[str]=None):
+# Fonction qui mesure chaque opération sur chaque taille de dataset et retourne les résultats
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for replicate in scales:
+            for extra in extras:
+                path = os.path.join(directory, f"mushrooms-x{replicate}-w{extra}.csv")
+                size = scaled_csv(source, path, replicate, extra)
+                for name, function, items in cases(path):
+                    if only and name not in only:
+                        continue
+                    seconds, peak = measure(function, repeat)
+                    results.append({
+                        "case": name, "rows": size, "replicate": replicate, "extra_attributes": extra,
+                        "seconds": seconds, "items_per_second": items / seconds if seconds else None, "peak_bytes": peak,
+                    })
+                    print(f"{name:22} x{replicate:<4} +{extra:<3} {seconds*1000:10.2f} ms {peak/2**20:9.2f} MiB", file=sys.stderr)
+    return results
+
+def revision():
+# Fonction qui retourne le commit git courant, pour comparer les résultats entre commits
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv):
+    # Fonction principale : mesure des performances et export JSON
+    parser = argparse.ArgumentParser(description="Mesure des performances de project.py")
+    parser.add_argument("--source", default="mushrooms.csv", help="CSV de départ")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10], help="Nombres de répétitions des lignes")
+    parser.add_argument("--extra", type=int, nargs="+", default=[0, 20], help="Nombres d'attributs synthétiques ajoutés")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre d'exécutions mesurées par opération")
+    parser.add_argument("--only", nargs="+", help="Opérations à mesurer")
+    parser.add_argument("--json", help="Fichier JSON des résultats (sortie standard par défaut)")
+    args = parser.parse_args(argv[1:])
+    report = {
+        "python": sys.version.split()[0], "revision": revision(), "created": time.time(),
+        "results": run(args.source, args.scale, args.extra, args.repeat, args.only),
+    }
+    if args.json:
+        with open(args.json, "w", encoding='UTF-8') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+if __name__ == "__main__":
+    main(sys.argv)
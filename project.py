@@ -1,11 +1,47 @@
-import sys, csv
-from math import log2
+import sys, asyncio, cProfile, csv, hashlib, json, mmap, multiprocessing, os, random, struct, tempfile, time
+from array import array
+from collections import Counter, OrderedDict, deque
+from itertools import chain, compress, count, islice, repeat
+from math import fsum, log2
+from multiprocessing.shared_memory import SharedMemory
+
+class Schema:
+# Classe qui représente la liste des attributs partagée par les champignons construits dans le même ordre
+# Les schémas forment un arbre : ajouter un attribut retourne toujours le même schéma fils
+    __slots__ = ("names_", "positions_", "next_")
+
+    def __init__(self, names: tuple=()):
+        self.names_ = tuple(names) # Attributs dans l'ordre des valeurs
+        self.positions_ = {name: i for i, name in enumerate(self.names_)} # Position de chaque attribut
+        self.next_ = {} # Attribut ajouté -> schéma fils
+
+    def extend(self, name: str):
+    # Méthode qui retourne le schéma partagé obtenu en ajoutant un attribut
+        child = self.next_.get(name)
+        if child is None:
+            child = self.next_[name] = Schema(self.names_ + (name,))
+        return child
+
+empty_schema = Schema() # Racine des schémas
+
+def get_schema(names):
+# Fonction qui retourne le schéma partagé d'une liste d'attributs
+    schema = empty_schema
+    for name in names:
+        schema = schema.extend(name)
+    return schema
 
 class Mushroom:
     # Classe qui représente un champignon
-    def __init__(self, edible: bool):
+    # Les valeurs sont un tuple dans l'ordre d'un schéma partagé par tous les champignons de mêmes attributs
+    __slots__ = ("__edible", "schema_", "values_")
+
+    def __init__(self, edible: bool, schema: Schema=None, values: tuple=()):
         self.__edible = edible
-        self.__attributes = {}
+        self.schema_ = empty_schema if schema is None else schema
+        self.values_ = tuple(values)
+        if len(self.values_) != len(self.schema_.names_):
+            raise ValueError(f"{len(self.values_)} valeurs pour {len(self.schema_.names_)} attributs")
     
     def is_edible(self):
     # Méthode qui retourne un booléen sur la comestibilité d'un champignon
@@ -13,22 +49,31 @@ class Mushroom:
     
     def add_attribute(self, name: str, value: str):
     # Méthode qui ajoute un attribut à un champignon en le reliant à sa valeur
-        self.__attributes[name] = value
+        position = self.schema_.positions_.get(name)
+        if position is None:
+            self.schema_ = self.schema_.extend(name)
+            self.values_ += (value,)
+        else: # Attribut déjà présent : valeur remplacée
+            self.values_ = self.values_[:position] + (value,) + self.values_[position + 1:]
     
     def get_attribute(self, name: str):
     # Méthode qui retourne la valeur d'un attribut d'un champignon
-        return self.__attributes[name]
+        return self.values_[self.schema_.positions_[name]]
 
     def get_attributes(self):
     # Méthode qui retourne une liste des attributs d'un champignon
-        return list(self.__attributes.keys())
+        return list(self.schema_.names_)
 
 class Node:
 # Classe qui représente un noeud d'un arbre de décision
+# Les arêtes sont deux listes parallèles (labels et enfants), vides et partagées tant qu'aucune arête n'est ajoutée
+    __slots__ = ("criterion_", "is_leaf_", "stats_", "labels_", "children_")
+
     def __init__(self, criterion: str, is_leaf: bool=False):
-        self.edges_ = []
+        self.labels_, self.children_ = (), () # Label et enfant de chaque arête
         self.criterion_ = criterion
         self.is_leaf_ = is_leaf
+        self.stats_ = None # [total, comestibles(, attributs candidats, tables)] si l'arbre est incrémental
     
     def get_criterion(self):
     # Méthode qui retourne le critère du noeud
@@ -40,10 +85,26 @@ class Node:
     
     def add_edge(self, label: str, child: "Node"):
     # Méthode qui ajoute une arête à un noeud
-        self.edges_.append(Edge(self, child, label))
+        if not self.labels_: # Première arête
+            self.labels_, self.children_ = [label], [child]
+        else:
+            self.labels_.append(label)
+            self.children_.append(child)
+
+    def get_child(self, label: str):
+    # Méthode qui retourne l'enfant relié au label (None si aucune arête ne correspond)
+        labels = self.labels_
+        return self.children_[labels.index(label)] if label in labels else None
+
+    @property
+    def edges_(self):
+    # Propriété qui retourne les arêtes du noeud, créées à la demande
+        return [Edge(self, child, label) for label, child in zip(self.labels_, self.children_)]
 
 class Edge:
-# Classe qui représente une arête d'un arbre de décision
+# Classe qui représente une arête d'un arbre de décision (vue sur un noeud, non stockée dans l'arbre)
+    __slots__ = ("parent_", "child_", "label_")
+
     def __init__(self, parent: Node, child: Node, label: str):
         self.parent_: Node = parent
         self.child_: Node = child
@@ -63,6 +124,8 @@ class Edge:
 
 class BooleanTree:
 # Classe qui stocke les données nécessaires pour créer un arbre booléen
+    __slots__ = ("node", "tab", "edges_", "amount_or", "edge")
+
     def __init__(self, node: Node, tab: int=0):
         self.node, self.tab = node, tab
         self.edges_ = [edge for edge in node.edges_ if edge.get_child().criterion_ != "No"]
@@ -75,6 +138,8 @@ class BooleanTree:
 
 class PythonScript:
     # Classe qui stocke les données nécessaires pour créer un script python
+    __slots__ = ("leaves", "node", "tab", "edge", "if_", "edges_")
+
     def __init__(self, node:Node, tab: int=1):
         self.leaves, self.node = [], node
         self.tab = tab
@@ -95,210 +160,1706 @@ class PythonScript:
         label = self.edge.get_label()
         self.leaves.append(label)
     
-def load_dataset(path: str):
+dataset_tokens = count() # Identifiants uniques des datasets
+
+def column_typecode(size: int):
+# Fonction qui retourne le type de tableau d'une colonne de size codes : 2 octets, 4 au-delà de 65536 valeurs
+    return "H" if size <= 0x10000 else "I"
+
+class Dataset:
+# Classe qui stocke un dataset de champignons sous forme de colonnes d'entiers
+# Chaque colonne est un tableau compact de codes, le vocabulaire de la colonne relie chaque code à sa valeur
+# Une colonne de plus de 65536 valeurs différentes passe de codes sur 2 octets ("H") à 4 octets ("I")
+    def __init__(self, attributes: list[str]):
+        self.attributes_ = list(attributes) # Liste des attributs
+        self.positions_ = {attribute: i for i, attribute in enumerate(self.attributes_)} # Position de chaque attribut
+        self.columns_ = [array("H") for _ in self.attributes_] # Colonnes encodées
+        self.vocabularies_ = [[] for _ in self.attributes_] # Code -> valeur pour chaque colonne
+        self.codes_ = [{} for _ in self.attributes_] # Valeur -> code pour chaque colonne
+        self.edible_ = array("B") # Comestibilité de chaque ligne
+        self.rows_ = None # Indices des lignes de la vue (None si toutes les lignes)
+        self.token_ = next(dataset_tokens) # Identifiant des données, partagé par les vues (voir SplitCache)
+
+    @classmethod
+    def from_mushrooms(cls, mushrooms: list):
+    # Méthode qui encode une liste de champignons dans un dataset
+    # Les attributs sont l'union de ceux des champignons, un attribut absent a la valeur None
+        names, previous = {}, None
+        for mushroom in mushrooms: # Union des attributs dans l'ordre d'apparition, un seul appel par schéma
+            schema = getattr(mushroom, "schema_", None)
+            if schema is None or schema is not previous:
+                names.update(dict.fromkeys(mushroom.get_attributes()))
+                previous = schema
+        dataset = cls(names)
+        schema = get_schema(dataset.attributes_)
+        for mushroom in mushrooms:
+            if getattr(mushroom, "schema_", None) is schema: # Valeurs déjà dans l'ordre des attributs
+                dataset.append(mushroom.is_edible(), mushroom.values_)
+            else:
+                present = set(mushroom.get_attributes())
+                dataset.append(mushroom.is_edible(), [mushroom.get_attribute(a) if a in present else None for a in dataset.attributes_])
+        return dataset
+
+    def encode(self, position: int, value: str):
+    # Méthode qui retourne le code d'une valeur d'une colonne en l'ajoutant au vocabulaire si besoin
+        codes = self.codes_[position]
+        code = codes.get(value)
+        if code is None:
+            code = len(codes)
+            codes[value] = code
+            self.vocabularies_[position].append(value)
+        return code
+
+    def append(self, edible: bool, values: list[str]):
+    # Méthode qui ajoute une ligne au dataset
+        if len(values) != len(self.attributes_):
+            raise ValueError(f"{len(values)} valeurs pour {len(self.attributes_)} attributs")
+        for position, value in enumerate(values):
+            code = self.encode(position, value)
+            self.writable(position).append(code)
+        self.edible_.append(1 if edible else 0)
+
+    def extend(self, rows: list[list[str]]):
+    # Méthode qui ajoute un morceau de lignes CSV (classe puis valeurs) en encodant colonne par colonne
+        rows = [row for row in rows if row] # Lignes vides ignorées
+        for row in rows:
+            if len(row) != len(self.attributes_) + 1:
+                raise ValueError(f"{len(row) - 1} valeurs pour {len(self.attributes_)} attributs")
+        if not rows:
+            return
+        values = list(zip(*rows)) # Transposition du morceau seulement
+        self.edible_.extend([value == "Yes" for value in values[0]])
+        for position, column in enumerate(values[1:]):
+            codes = list(map(self.codes_[position].get, column))
+            if None in codes: # Nouvelles valeurs à ajouter au vocabulaire
+                codes = [self.encode(position, value) for value in column]
+            self.writable(position).extend(codes)
+
+    def writable(self, position: int):
+    # Méthode qui retourne la colonne d'un attribut, élargie si ses codes ne tiennent plus dans son type
+        column = self.columns_[position]
+        typecode = column_typecode(len(self.codes_[position]))
+        if typecode == "I" and column.typecode == "H":
+            column = self.columns_[position] = array(typecode, column)
+        return column
+
+    def formats(self):
+    # Méthode qui retourne les types des colonnes ("H" ou "I"), pour les recréer à partir d'octets bruts
+        return "".join(memoryview(column).format for column in self.columns_)
+
+    def new_chunk(self):
+    # Méthode qui retourne un dataset vide partageant les attributs et le vocabulaire de celui-ci
+        chunk = Dataset.__new__(Dataset)
+        chunk.__dict__.update(self.__dict__)
+        chunk.columns_ = [array(column_typecode(len(codes))) for codes in self.codes_]
+        chunk.edible_, chunk.rows_ = array("B"), None
+        chunk.token_ = next(dataset_tokens) # Autres lignes : autre identifiant
+        return chunk
+
+    def copy(self):
+    # Méthode qui retourne une copie modifiable (colonnes en tableaux) des lignes de la vue
+        copy = self.new_chunk() # Le vocabulaire reste partagé : les codes sont identiques
+        rows = self.indices()
+        for column, source in zip(copy.columns_, self.columns_):
+            column.extend(map(source.__getitem__, rows))
+        copy.edible_.extend(map(self.edible_.__getitem__, rows))
+        return copy
+
+    def take(self, rows):
+    # Méthode qui retourne une vue du dataset limitée aux lignes données (indices du dataset complet)
+        view = Dataset.__new__(Dataset)
+        view.__dict__.update(self.__dict__) # Les colonnes et vocabulaires sont partagés
+        view.rows_ = rows if isinstance(rows, array) else array("l", rows)
+        return view
+
+    def indices(self):
+    # Méthode qui retourne les indices des lignes de la vue dans le dataset complet
+        return range(len(self.edible_)) if self.rows_ is None else self.rows_
+
+    def column(self, attribute: str):
+    # Méthode qui retourne la colonne encodée d'un attribut
+        return self.columns_[self.positions_[attribute]]
+
+    def vocabulary(self, attribute: str):
+    # Méthode qui retourne le vocabulaire (code -> valeur) d'un attribut
+        return self.vocabularies_[self.positions_[attribute]]
+
+    def count_edible(self):
+    # Méthode qui retourne le nombre de champignons comestibles de la vue
+        if self.rows_ is None:
+            return sum(self.edible_)
+        return sum(map(self.edible_.__getitem__, self.rows_))
+
+    def __len__(self):
+        return len(self.edible_) if self.rows_ is None else len(self.rows_)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice): # Tranche : vue sur les lignes, comme l'ancienne liste de champignons
+            return self.take(self.indices()[i])
+        return Row(self, self.indices()[i])
+
+    def __iter__(self):
+        return (Row(self, i) for i in self.indices())
+
+class Row:
+# Classe qui représente une ligne d'un dataset sans créer de Mushroom
+    __slots__ = ("dataset_", "index_")
+
+    def __init__(self, dataset: Dataset, index: int):
+        self.dataset_, self.index_ = dataset, index
+
+    def is_edible(self):
+    # Méthode qui retourne un booléen sur la comestibilité du champignon
+        return self.dataset_.edible_[self.index_] == 1
+
+    def get_attribute(self, name: str):
+    # Méthode qui retourne la valeur d'un attribut du champignon
+        dataset = self.dataset_
+        position = dataset.positions_[name]
+        return dataset.vocabularies_[position][dataset.columns_[position][self.index_]]
+
+    def get_attributes(self):
+    # Méthode qui retourne une liste des attributs du champignon
+        return list(self.dataset_.attributes_)
+
+def as_dataset(mushrooms):
+# Fonction qui retourne un dataset à partir d'un dataset, d'une liste de lignes ou d'une liste de champignons
+    if isinstance(mushrooms, Dataset):
+        return mushrooms
+    mushrooms = list(mushrooms)
+    if mushrooms and all(isinstance(m, Row) for m in mushrooms):
+        dataset = mushrooms[0].dataset_
+        if all(m.dataset_.columns_ is dataset.columns_ for m in mushrooms): # Lignes d'un même dataset
+            return dataset.take([m.index_ for m in mushrooms])
+    return Dataset.from_mushrooms(mushrooms)
+
+def encode_chunks(rows, chunk_size: int=4096):
+# Fonction génératrice qui encode des lignes CSV (en-tête compris) par morceaux partageant le même vocabulaire
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None: # Aucune ligne
+        return
+    schema = Dataset(header[1:]) # Attributs et vocabulaire communs aux morceaux
+    while chunk := list(islice(rows, chunk_size)): # Au plus chunk_size lignes de texte en mémoire
+        dataset = schema.new_chunk()
+        dataset.extend(chunk)
+        yield dataset
+
+def read_chunks(path: str, chunk_size: int=4096):
+# Fonction génératrice qui lit un fichier CSV de champignons par morceaux encodés
+    with open(path, "r", encoding='UTF-8') as file:
+        yield from encode_chunks(csv.reader(file), chunk_size)
+
+CACHE_MAGIC = b"MUSHROOMS-CACHE2" # Signature des fichiers de cache
+UMASK = os.umask(0o22) # Masque des droits du processus (lu en le remplaçant, puis rétabli)
+os.umask(UMASK)
+
+def write_binary(path: str, magic: bytes, meta: dict, buffers: list):
+# Fonction qui écrit un fichier binaire : signature, métadonnées JSON puis tampons bruts alignés sur 8 octets
+    meta = dict(meta, byteorder=sys.byteorder, buffers=[[memoryview(b).format, len(b)] for b in buffers])
+    header = json.dumps(meta).encode("UTF-8")
+    # Écriture dans un fichier temporaire propre à l'appel puis remplacement : deux écritures simultanées
+    # du même fichier ne se mélangent pas, le fichier publié est toujours complet
+    descriptor, temporary = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                             dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(magic + struct.pack("<Q", len(header)) + header)
+            for buffer in buffers:
+                file.write(bytes(-file.tell() % 8)) # Alignement de chaque tampon
+                file.write(buffer)
+        os.chmod(temporary, 0o666 & ~UMASK) # Droits d'un fichier ordinaire (mkstemp : propriétaire seul)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+def read_binary(path: str, magic: bytes):
+# Fonction qui projette (mmap) un fichier écrit par write_binary, retourne (métadonnées, tampons)
+# ou None s'il est absent, d'un autre format, d'un autre boutisme, tronqué ou invalide
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with file:
+        start = file.read(len(magic) + 8)
+        if len(start) != len(magic) + 8 or start[:len(magic)] != magic:
+            return None
+        size, = struct.unpack("<Q", start[len(magic):])
+        try: # En-tête JSON complet et bien formé
+            meta = json.loads(file.read(size))
+            if meta["byteorder"] != sys.byteorder:
+                return None
+            layout = [(typecode, length * array(typecode).itemsize) for typecode, length in meta["buffers"]]
+        except (ValueError, KeyError, TypeError):
+            return None
+        data = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+    buffers, offset = [], len(magic) + 8 + size
+    for typecode, nbytes in layout: # Vues en lecture seule, partagées avec le fichier
+        offset += -offset % 8
+        if offset + nbytes > len(data): # Fichier tronqué
+            return None
+        buffers.append(data[offset:offset + nbytes].cast(typecode))
+        offset += nbytes
+    return meta, buffers
+
+def write_cache(dataset: Dataset, path: str, source: str=None):
+# Fonction qui écrit un dataset complet dans un cache binaire : métadonnées JSON puis colonnes brutes alignées
+    stat = os.stat(source) if source is not None else None
+    meta = {"attributes": dataset.attributes_, "vocabularies": dataset.vocabularies_,
+            "source": None if stat is None else [stat.st_size, stat.st_mtime_ns]}
+    write_binary(path, CACHE_MAGIC, meta, [dataset.edible_, *dataset.columns_])
+
+def read_cache(path: str, source: str=None):
+# Fonction qui charge un cache binaire sans copie (mmap), retourne None s'il est absent ou périmé
+    content = read_binary(path, CACHE_MAGIC)
+    if content is None:
+        return None
+    meta, buffers = content
+    if len(buffers) != len(meta["attributes"]) + 1 or any(len(b) != len(buffers[0]) for b in buffers):
+        return None # Colonnes incohérentes : le CSV est relu
+    if source is not None: # Invalidation par taille et date de modification du CSV
+        stat = os.stat(source)
+        if meta["source"] != [stat.st_size, stat.st_mtime_ns]:
+            return None
+    dataset = Dataset(meta["attributes"])
+    dataset.vocabularies_ = meta["vocabularies"]
+    dataset.codes_ = [{value: code for code, value in enumerate(vocabulary)} for vocabulary in dataset.vocabularies_]
+    dataset.edible_, dataset.columns_ = buffers[0], buffers[1:]
+    return dataset
+
+def load_dataset(path: str, chunk_size: int=4096, cache=None, trace: "Trace"=None):
 # Fonction qui charge un dataset de champignons
-    mushrooms = [] # Liste qui stocke les champignons
+# cache : chemin du cache binaire (True pour path + ".cache"), réutilisé tant que le CSV n'a pas changé
+# trace : instrumentation optionnelle (voir Trace)
+    start = time.perf_counter()
+    if cache:
+        cache = path + ".cache" if cache is True else cache
+        dataset = read_cache(cache, path)
+        if dataset is not None:
+            if trace is not None:
+                trace.add("read_cache", start)
+            return dataset
     with open(path, "r", encoding='UTF-8') as file: # Ouverture du fichier
-        data = list(csv.reader(file))
-        attributes = data[0][1:] # Liste des attributs
-        for row in data[1:]: # Parcours des lignes du fichier
-            mushroom = Mushroom(row[0] == "Yes") # Création d'un champignon
-            for attribute, value in zip(attributes, row[1:]):
-                mushroom.add_attribute(attribute, value) # Ajout des attributs
-            mushrooms.append(mushroom)
-    return mushrooms
-
-def entropy(mushrooms: list[Mushroom]):
-# Fonction qui calcule l'entropie d'un ensemble de champignons
-    pY = sum([mushroom.is_edible() for mushroom in mushrooms]) / len(mushrooms)
+        reader = csv.reader(file)
+        dataset = Dataset(next(reader)[1:]) # Création du dataset à partir des attributs
+        while rows := list(islice(reader, chunk_size)): # Lecture par morceaux
+            dataset.extend(rows) # Encodage du morceau dans les colonnes
+    if trace is not None:
+        trace.add("parse_csv", start)
+    if cache:
+        start = time.perf_counter()
+        try:
+            write_cache(dataset, cache, path)
+        except OSError: # Cache non écrit (dossier en lecture seule, disque plein...) : le dataset reste chargé
+            return dataset
+        if trace is not None:
+            trace.add("write_cache", start)
+    return dataset
+
+def entropy_from_counts(edible: int, total: int):
+# Fonction qui calcule l'entropie à partir du nombre de champignons comestibles et du total
+    pY = edible / total
     if pY == 0 or pY == 1: # Si la proportion de champignons comestibles est nulle ou égale à 1
         return 0 # L'entropie est nulle
     return log2(1 - pY)*(pY - 1) - log2(pY)*pY # Calcul de l'entropie
 
-def get_sub_attributes(mushrooms: list[Mushroom], attribute: str):
+def entropy(mushrooms):
+# Fonction qui calcule l'entropie d'un ensemble de champignons
+    dataset = as_dataset(mushrooms)
+    return entropy_from_counts(dataset.count_edible(), len(dataset))
+
+def get_sub_attributes(mushrooms, attribute: str):
 # Fonction qui retourne les sous-attributs d'un attribut
-    sub_attributes = set() # Ensemble qui stocke les sous-attributs
-    for mushroom in mushrooms: # Parcours des champignons
-        sub_attributes.add(mushroom.get_attribute(attribute)) # Ajout de l'attribut
-    return sub_attributes
+    dataset = as_dataset(mushrooms)
+    column, vocabulary = dataset.column(attribute), dataset.vocabulary(attribute)
+    return {vocabulary[code] for code in set(map(column.__getitem__, dataset.indices()))}
 
-def Ca_v(mushrooms : list[Mushroom], attribute : str):
+def Ca_v(mushrooms, attribute : str):
     # Fonction qui retourne les sous ensembles de champignons pour un attribut par rapport à ses valeurs
-    sub_attributes = get_sub_attributes(mushrooms, attribute) # Récupération des sous attributs
-    res = {sub_attribute: [] for sub_attribute in sub_attributes} # Dictionnaire qui stocke les sous ensembles
-    for mushroom in mushrooms:
-        res[mushroom.get_attribute(attribute)].append(mushroom) # Ajout du champignon dans le sous ensemble
-    return res
+    dataset = as_dataset(mushrooms)
+    column, vocabulary = dataset.column(attribute), dataset.vocabulary(attribute)
+    partition = {} # Dictionnaire qui stocke les indices de chaque sous ensemble
+    for i in dataset.indices(): # Un seul parcours des lignes
+        code = column[i]
+        rows = partition.get(code)
+        if rows is None:
+            rows = partition[code] = array("l")
+        rows.append(i)
+    return {vocabulary[code]: dataset.take(rows) for code, rows in partition.items()}
 
-def get_information_gain(mushrooms: list[Mushroom], attribute : str):
-    # Fonction qui retourne le gain d'information d'un attribut
-    h, h1, ca_v = entropy(mushrooms), 0, Ca_v(mushrooms, attribute)
-    for c in ca_v.values(): # Parcours des sous ensembles
-        pa_v = len(c) / len(mushrooms)
-        h2 = entropy(c) # Calcul de l'entropie
-        h1 += pa_v * h2 # Calcul pour chaque sous ensemble
+def contingency_table(codes: list[int], edible: list[int]):
+# Fonction qui retourne, pour chaque valeur d'un attribut, le nombre de champignons et le nombre de comestibles
+    return Counter(codes), Counter(compress(codes, edible)) # Deux parcours en C, sans liste de champignons
+
+def gain_from_table(table: tuple[Counter, Counter], total: int, h: float):
+# Fonction qui calcule le gain d'information à partir d'une table de contingence
+# fsum : somme exacte, le gain ne dépend pas de l'ordre des valeurs (tables sommées par SplitCache)
+    totals, edibles = table
+    h1 = fsum(count / total * entropy_from_counts(edibles[code], count) for code, count in totals.items()) # Calcul pour chaque sous ensemble
     return h - h1 # Calcul du gain d'information
 
-def get_best_attribute(mushrooms: list[Mushroom]):
+class SplitCache:
+# Classe qui mémorise les tables de contingence, éviction LRU
+# Active dans un bloc with (ou via set_split_cache), elle est consultée par evaluate_splits et donc par tous les builders
+# Par défaut la clé est (dataset, empreinte des lignes, attribut) : seul un ensemble de lignes identique en profite
+# Si les lignes du dataset sont réparties en groupes (plis de cross_validate, voir set_groups), la clé est
+# (dataset, groupe, chemin du noeud, attribut) : la table d'un noeud est la somme des tables de ses groupes,
+# réutilisées par tous les arbres entraînés sur ces groupes. Les lignes d'entraînement doivent alors être
+# des groupes entiers
+# Les tables retournées sont partagées : elles ne doivent pas être modifiées
+    def __init__(self, maxsize: int=4096):
+        self.maxsize = maxsize # Nombre maximal de tables gardées
+        self.entries = OrderedDict() # Clé -> table, de la moins récemment utilisée à la plus récente
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self.groups = {} # Identifiant de dataset -> groupe de chaque ligne
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = set_split_cache(self)
+        return self
+
+    def __exit__(self, *exc):
+        set_split_cache(self.previous)
+        return False
+
+    def fingerprint(self, dataset: Dataset, rows):
+    # Méthode qui retourne l'empreinte d'un ensemble de lignes d'un dataset
+        if isinstance(rows, range):
+            return (dataset.token_, rows.start, rows.stop, rows.step)
+        return (dataset.token_, len(rows), hashlib.blake2b(rows if isinstance(rows, memoryview) else array("l", rows)).digest())
+
+    def set_groups(self, dataset: Dataset, groups=None):
+    # Méthode qui associe un groupe à chaque ligne d'un dataset (None pour retirer l'association)
+        if groups is None:
+            self.groups.pop(dataset.token_, None)
+        else:
+            self.groups[dataset.token_] = groups
+
+    def get(self, key):
+    # Méthode qui retourne une valeur mémorisée (None si absente) et la marque comme récente
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+    # Méthode qui mémorise une valeur en évinçant la moins récemment utilisée si besoin
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+    # Méthode qui retourne les compteurs de la cache
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self.entries)}
+
+split_cache = None # Cache des tables de contingence active (None : pas de cache)
+
+def set_split_cache(cache: SplitCache=None):
+# Fonction qui active une cache des tables de contingence (None pour la désactiver), retourne la précédente
+    global split_cache
+    previous, split_cache = split_cache, cache
+    return previous
+
+def grouped_tables(cache: SplitCache, dataset: Dataset, rows, positions: list[int], path: frozenset, groups):
+# Fonction qui retourne les tables de contingence et le nombre de comestibles de lignes réparties en groupes
+# La table d'un groupe porte sur toutes ses lignes vérifiant path : elle est calculée une fois pour tous les arbres
+    sums, edible = [(Counter(), Counter()) for _ in positions], 0
+    for group in sorted(set(map(groups.__getitem__, rows))): # Groupes présents
+        key = (dataset.token_, group, path)
+        tables, count = [cache.get((key, position)) for position in positions], cache.get((key, None))
+        if count is None or None in tables: # Lignes du groupe extraites seulement s'il manque une table
+            members = list(compress(rows, map(group.__eq__, map(groups.__getitem__, rows))))
+            classes = list(map(dataset.edible_.__getitem__, members))
+            count = sum(classes)
+            cache.put((key, None), count)
+            for i, position in enumerate(positions):
+                if tables[i] is None:
+                    tables[i] = contingency_table(list(map(dataset.columns_[position].__getitem__, members)), classes)
+                    cache.put((key, position), tables[i])
+        edible += count
+        for (totals, edibles), (group_totals, group_edibles) in zip(sums, tables):
+            totals.update(group_totals)
+            edibles.update(group_edibles)
+    return sums, edible
+
+def evaluate_splits(dataset: Dataset, rows, positions: list[int], edible: int=None, path: frozenset=None):
+# Fonction qui calcule les tables de contingence et les gains des attributs donnés (par position) sur des lignes
+# path : conditions (attribut, code) qui définissent les lignes du noeud, pour les datasets répartis en groupes (voir SplitCache)
+    cache = split_cache
+    groups = cache.groups.get(dataset.token_) if cache is not None and path is not None else None
+    if groups is not None: # Somme des tables de chaque groupe
+        tables, edible = grouped_tables(cache, dataset, rows, positions, path, groups)
+        h = entropy_from_counts(edible, len(rows))
+        return [(gain_from_table(table, len(rows), h), table) for table in tables]
+    if cache is not None: # Tables déjà calculées pour ces lignes
+        key = cache.fingerprint(dataset, rows)
+        tables = [cache.get((key, position)) for position in positions]
+        if edible is None:
+            edible = cache.get((key, None))
+    if cache is None or edible is None or None in tables:
+        classes = list(map(dataset.edible_.__getitem__, rows)) # Classes des lignes, extraites une seule fois
+        edible = sum(classes) if edible is None else edible
+    total = len(rows)
+    h = entropy_from_counts(edible, total)
+    gains = []
+    for i, position in enumerate(positions): # Parcours des colonnes
+        table = tables[i] if cache is not None else None
+        if table is None:
+            table = contingency_table(list(map(dataset.columns_[position].__getitem__, rows)), classes)
+            if cache is not None:
+                cache.put((key, position), table)
+        gains.append((gain_from_table(table, total, h), table))
+    if cache is not None:
+        cache.put((key, None), edible)
+    return gains
+
+def get_split_gains(mushrooms, attributes: list[str]=None):
+# Fonction qui calcule en un passage par colonne les tables de contingence et les gains de plusieurs attributs
+    dataset = as_dataset(mushrooms)
+    attributes = dataset.attributes_ if attributes is None else attributes
+    return evaluate_splits(dataset, dataset.indices(), [dataset.positions_[a] for a in attributes])
+
+def get_information_gain(mushrooms, attribute : str):
+    # Fonction qui retourne le gain d'information d'un attribut
+    return get_split_gains(mushrooms, [attribute])[0][0]
+
+def get_best_attribute(mushrooms):
     # Fonction qui retourne le meilleur attribut pour construire l'arbre de décision
-    attributes = mushrooms[0].get_attributes()
-    best_attribute = attributes[0]
-    best_information_gain = get_information_gain(mushrooms, best_attribute)
-    for attribute in attributes[1:]: # Parcours des attributs
-        information_gain = get_information_gain(mushrooms, attribute) # Calcul du gain d'information
-        if information_gain > best_information_gain: # Si le gain d'information est supérieur
+    dataset = as_dataset(mushrooms)
+    attributes = dataset.attributes_
+    best_attribute, best_information_gain = attributes[0], None
+    for attribute, (information_gain, _) in zip(attributes, get_split_gains(dataset)): # Parcours des attributs
+        if best_information_gain is None or information_gain > best_information_gain: # Le premier attribut gagne en cas d'égalité
             best_attribute = attribute # Mise à jour de l'attribut
             best_information_gain = information_gain # Mise à jour du gain d'information
     return best_attribute
 
-def build_decision_tree(mushrooms: list[Mushroom]):
-    # Fonction qui construit un arbre de décision
-    best_attribute = get_best_attribute(mushrooms) # Récupération du meilleur attribut
-    r = Node(best_attribute) # Création du noeud ayant comme racine le meilleur attribut
-    ca_v = Ca_v(mushrooms, best_attribute) # Récupération des sous ensembles
-    for sub_attribute, c in ca_v.items(): # Parcours des sous ensembles
-        if entropy(c) == 0: # Si l'entropie est nulle
-            criterion = "Yes" if c[0].is_edible() else "No"
-            r.add_edge(sub_attribute, Node(criterion, True)) # Création d'une feuille
+def partition_rows(dataset: Dataset, rows: memoryview, lo: int, hi: int, position: int, totals: Counter):
+# Fonction qui regroupe en place les lignes rows[lo:hi] par code de l'attribut, dans l'ordre des codes
+# Tri par dénombrement stable en un passage : totals (table de contingence du noeud) donne le début de chaque groupe
+    column, segment = dataset.columns_[position], rows[lo:hi].tolist()
+    starts = [0] * (max(totals) + 1) # Prochaine place de chaque code
+    for code in sorted(totals):
+        starts[code] = lo
+        lo += totals[code]
+    for i, code in zip(segment, map(column.__getitem__, segment)):
+        rows[starts[code]] = i
+        starts[code] += 1
+
+def select_split(gains: list):
+# Fonction qui retourne l'indice du meilleur gain, le premier attribut gagne en cas d'égalité
+    best = 0
+    for i in range(1, len(gains)):
+        if gains[i][0] > gains[best][0]:
+            best = i
+    return best
+
+class Trace:
+# Classe qui enregistre le déroulement d'un chargement et d'une construction (passée via trace=)
+# Sans trace, les fonctions ne font qu'un test "trace is not None" par noeud
+# Avec la construction parallèle, les sous-arbres confiés aux processus sont comptés sans être détaillés
+# Les noeuds sont construits un par un (file de travail) : "seconds" est le temps propre du noeud, sans ses enfants
+    def __init__(self, profile: str=None):
+        self.profile, self.profiler = profile, None # Fichier des statistiques cProfile (bloc with)
+        self.calls, self.seconds = Counter(), Counter() # Nombre d'appels et temps cumulé par étape
+        self.rows_examined = 0 # Lignes lues pour les tables de contingence (une fois par attribut)
+        self.nodes, self.record = [], None # Noeuds terminés et noeud en cours
+
+    def __enter__(self):
+        if self.profile is not None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.profile)
+        return False
+
+    def add(self, name: str, start: float, calls: int=1):
+    # Méthode qui compte une étape commencée à start
+        self.calls[name] += calls
+        self.seconds[name] += time.perf_counter() - start
+
+    def open_node(self, rows: int, depth: int):
+    # Méthode qui commence l'enregistrement d'un noeud
+        self.record = {"depth": depth, "rows": rows, "attributes": 0, "criterion": None, "gain": None,
+                       "split_seconds": 0.0, "partition_seconds": 0.0, "seconds": 0.0,
+                       "start": time.perf_counter()}
+
+    def split(self, gains: list, best: int):
+    # Méthode qui enregistre l'évaluation des attributs du noeud courant
+        record, now = self.record, time.perf_counter()
+        record["attributes"], record["gain"] = len(gains), gains[best][0]
+        record["split_seconds"], record["split_end"] = now - record["start"], now
+        self.rows_examined += record["rows"] * len(gains)
+        self.calls["evaluate_splits"] += 1
+        self.calls["contingency_table"] += len(gains)
+        self.calls["entropy"] += 1 + sum(len(table[0]) for _, table in gains) # Parent puis chaque sous ensemble
+        self.seconds["evaluate_splits"] += record["split_seconds"]
+
+    def partitioned(self):
+    # Méthode qui enregistre la partition des lignes du noeud courant
+        record = self.record
+        record["partition_seconds"] = time.perf_counter() - record.pop("split_end")
+        self.calls["partition_rows"] += 1
+        self.seconds["partition_rows"] += record["partition_seconds"]
+
+    def close_node(self, node: Node, remote: int=0):
+    # Méthode qui termine l'enregistrement du noeud courant (remote : sous-arbres confiés aux processus)
+        record, self.record = self.record, None
+        record["seconds"] = time.perf_counter() - record.pop("start")
+        record["criterion"], record["remote_subtrees"] = node.criterion_, remote
+        self.calls["build_node"] += 1
+        self.nodes.append(record)
+
+    def to_dict(self):
+    # Méthode qui retourne la trace sous forme de dictionnaire sérialisable en JSON
+        return {"calls": dict(self.calls), "seconds": dict(self.seconds), "rows_examined": self.rows_examined,
+                "nodes": sorted(self.nodes, key=lambda record: record["depth"])}
+
+    def to_json(self):
+    # Méthode qui retourne la trace en JSON sur une ligne, pour les journaux
+        return json.dumps(self.to_dict())
+
+def build_node(dataset: Dataset, rows: memoryview, lo: int, hi: int, edible: int, used: frozenset,
+               trace: Trace=None, stats: bool=False, breadth_first: bool=False, path: frozenset=None):
+# Fonction qui construit le noeud des lignes rows[lo:hi] et ses descendants sans copier de sous ensemble
+# Les noeuds à construire attendent dans une file de travail (pas de récursion, profondeur quelconque) :
+# en profondeur par défaut, niveau par niveau avec breadth_first. Chaque arête est créée avec un enfant
+# provisoire, remplacé quand son noeud est construit : l'arbre est le même dans les deux ordres
+# stats : garde dans chaque noeud ses effectifs et ses tables de contingence (voir IncrementalTree)
+# path : conditions des lignes de la racine (frozenset() si ce sont des groupes entiers, voir SplitCache), None sinon
+    tree = [None] # Emplacement de la racine
+    work = deque([(tree, 0, lo, hi, edible, used, 0, path)]) # (enfants du parent, indice, lo, hi, comestibles, attributs utilisés, profondeur, chemin)
+    take = work.popleft if breadth_first else work.pop
+    while work:
+        parent, index, lo, hi, edible, used, depth, path = take()
+        if trace is not None:
+            trace.open_node(hi - lo, depth)
+        positions = [p for p in range(len(dataset.attributes_)) if p not in used] # Attributs pas encore utilisés
+        if not positions: # Plus aucun attribut pour séparer les lignes
+            r = Node("Yes" if 2*edible > hi - lo else "No", True) # Feuille majoritaire (non comestible en cas d'égalité)
+            if stats:
+                r.stats_ = [hi - lo, edible]
         else:
-            r.add_edge(sub_attribute, build_decision_tree(c)) # Création d'un noeud via récursivité
+            gains = evaluate_splits(dataset, rows[lo:hi], positions, edible, path)
+            best = select_split(gains)
+            if trace is not None:
+                trace.split(gains, best)
+            position, (totals, edibles) = positions[best], gains[best][1]
+            r = Node(dataset.attributes_[position]) # Création du noeud ayant comme racine le meilleur attribut
+            if stats:
+                r.stats_ = [hi - lo, edible, positions, [(Counter(t), Counter(e)) for _, (t, e) in gains]] # Copies modifiables
+            partition_rows(dataset, rows, lo, hi, position, totals)
+            if trace is not None:
+                trace.partitioned()
+            vocabulary, children, child_used = dataset.vocabularies_[position], [], used | {position}
+            for code in sorted(totals): # Parcours des sous ensembles, contigus dans rows
+                count, yes = totals[code], edibles[code]
+                if yes == 0 or yes == count: # Si l'entropie est nulle
+                    leaf = Node("Yes" if yes else "No", True) # Création d'une feuille
+                    if stats:
+                        leaf.stats_ = [count, yes]
+                    r.add_edge(vocabulary[code], leaf)
+                else: # Sous ensemble à construire plus tard
+                    r.add_edge(vocabulary[code], None)
+                    child_path = None if path is None else path | {(position, code)}
+                    children.append((r.children_, len(r.children_) - 1, lo, lo + count, yes, child_used, depth + 1, child_path))
+                lo += count
+            work.extend(children if breadth_first else reversed(children)) # Premier enfant construit en premier
+        parent[index] = r
+        if trace is not None:
+            trace.close_node(r)
+    return tree[0]
+
+def shared_views(buffer: memoryview, formats: str, total: int, rows: int):
+# Fonction qui découpe une mémoire partagée en vues : comestibilité, colonnes (types formats) puis indices des lignes
+    views, offset = [], 0
+    for size, typecode in [(total, "B")] + [(array(f).itemsize*total, f) for f in formats] + [(array("l").itemsize*rows, "l")]:
+        views.append(buffer[offset:offset + size].cast(typecode))
+        offset += size + (-size % 8) # Alignement de chaque vue
+    return views, offset
+
+def share_dataset(dataset: Dataset, rows: array):
+# Fonction qui copie une seule fois les colonnes d'un dataset et un tableau d'entiers dans une mémoire partagée
+    total, formats = len(dataset.edible_), dataset.formats()
+    size = sum(n + (-n % 8) for n in [total] + [array(f).itemsize*total for f in formats] + [array("l").itemsize*len(rows)])
+    memory = SharedMemory(create=True, size=max(size, 1))
+    views, _ = shared_views(memory.buf, formats, total, len(rows))
+    for view, source in zip(views, [dataset.edible_, *dataset.columns_, rows]):
+        view[:] = source
+    return memory, views
+
+def release_shared(memory: SharedMemory, views: list[memoryview]):
+# Fonction qui libère les vues puis la mémoire partagée
+    for view in views:
+        view.release()
+    memory.close()
+    memory.unlink()
+
+class ParallelBuild:
+# Classe qui stocke les données nécessaires pour construire un arbre de décision avec plusieurs processus
+# Le dataset et le tableau d'indices sont copiés une fois dans une mémoire partagée, les processus
+# évaluent les attributs des grands noeuds et construisent les sous-arbres de moins de min_rows lignes
+    def __init__(self, dataset: Dataset, processes: int, min_rows: int, trace: Trace=None):
+        self.processes, self.min_rows, self.trace = processes, min_rows, trace
+        self.attributes_, self.vocabularies_ = dataset.attributes_, dataset.vocabularies_
+        indices = array("l", dataset.indices())
+        self.total, self.size = len(dataset.edible_), len(indices)
+        self.memory, self.views = share_dataset(dataset, indices)
+        self.formats = dataset.formats()
+        self.dataset = shared_dataset(self.views, self.attributes_, self.vocabularies_)
+        self.edible = dataset.count_edible()
+        self.pool, self.pending = None, []
+
+    def run(self):
+    # Méthode qui construit l'arbre puis libère la mémoire partagée
+        try:
+            initargs = (self.memory.name, self.attributes_, self.vocabularies_, self.formats, self.total, self.size)
+            with multiprocessing.Pool(self.processes, init_worker, initargs) as self.pool:
+                root = self.grow(0, self.size, self.edible, frozenset())
+                for node, i, result in self.pending: # Récupération des sous-arbres construits en parallèle
+                    node.children_[i] = result.get()
+            return root
+        finally:
+            self.dataset = None
+            release_shared(self.memory, self.views)
+
+    def grow(self, lo: int, hi: int, edible: int, used: frozenset):
+    # Méthode qui construit niveau par niveau les grands noeuds, dont les attributs sont évalués en parallèle
+        tree, trace = [None], self.trace
+        work = deque([(tree, 0, lo, hi, edible, used, 0)]) # Même file de travail que build_node, en largeur
+        while work:
+            parent, index, lo, hi, edible, used, depth = work.popleft()
+            remote = 0
+            if trace is not None:
+                trace.open_node(hi - lo, depth)
+            positions = [p for p in range(len(self.attributes_)) if p not in used]
+            if not positions:
+                r = Node("Yes" if 2*edible > hi - lo else "No", True)
+            else:
+                step = -(-len(positions) // self.processes) # Groupes d'attributs contigus pour garder l'ordre
+                groups = [positions[i:i + step] for i in range(0, len(positions), step)]
+                parts = self.pool.starmap(evaluate_task, [(lo, hi, group, edible) for group in groups])
+                gains = [gain for part in parts for gain in part]
+                best = select_split(gains)
+                if trace is not None:
+                    trace.split(gains, best)
+                position, (totals, edibles) = positions[best], gains[best][1]
+                r = Node(self.attributes_[position])
+                partition_rows(self.dataset, self.views[-1], lo, hi, position, totals)
+                if trace is not None:
+                    trace.partitioned()
+                vocabulary, child_used = self.vocabularies_[position], used | {position}
+                for code in sorted(totals):
+                    count, yes = totals[code], edibles[code]
+                    if yes == 0 or yes == count:
+                        r.add_edge(vocabulary[code], Node("Yes" if yes else "No", True))
+                    elif count >= self.min_rows: # Grand sous ensemble : attributs évalués en parallèle
+                        r.add_edge(vocabulary[code], None)
+                        work.append((r.children_, len(r.children_) - 1, lo, lo + count, yes, child_used, depth + 1))
+                    else: # Petit sous ensemble : sous-arbre entier confié à un processus
+                        r.add_edge(vocabulary[code], None)
+                        self.pending.append((r, len(r.children_) - 1, self.pool.apply_async(subtree_task, (lo, lo + count, yes, child_used))))
+                        remote += 1
+                    lo += count
+            parent[index] = r
+            if trace is not None:
+                trace.close_node(r, remote)
+        return tree[0]
+
+def shared_dataset(views: list[memoryview], attributes: list[str], vocabularies: list[list]):
+# Fonction qui crée un dataset dont les colonnes sont des vues d'une mémoire partagée
+    dataset = Dataset(attributes)
+    dataset.vocabularies_ = vocabularies
+    dataset.codes_ = [{value: code for code, value in enumerate(vocabulary)} for vocabulary in vocabularies]
+    dataset.edible_, dataset.columns_ = views[0], views[1:-1]
+    return dataset
+
+worker = {} # Données partagées d'un processus de construction
+
+def init_worker(name: str, attributes: list[str], vocabularies: list[list], formats: str, total: int, size: int):
+# Fonction qui rattache un processus de construction à la mémoire partagée
+    memory = SharedMemory(name=name)
+    views, _ = shared_views(memory.buf, formats, total, size)
+    worker.update(memory=memory, rows=views[-1], dataset=shared_dataset(views, attributes, vocabularies))
+
+def evaluate_task(lo: int, hi: int, positions: list[int], edible: int):
+# Fonction exécutée par un processus : gains d'un groupe d'attributs sur rows[lo:hi]
+    return evaluate_splits(worker["dataset"], worker["rows"][lo:hi], positions, edible)
+
+def subtree_task(lo: int, hi: int, edible: int, used: frozenset):
+# Fonction exécutée par un processus : sous-arbre des lignes rows[lo:hi] (segment propre à la tâche)
+    return build_node(worker["dataset"], worker["rows"], lo, hi, edible, used)
+
+def build_decision_tree(mushrooms, processes: int=1, min_rows: int=100000, trace: Trace=None, breadth_first: bool=False):
+    # Fonction qui construit un arbre de décision
+    # breadth_first : noeuds construits niveau par niveau (voir build_node), même arbre
+    # processes > 1 (None pour tous les coeurs) : construction parallèle si le dataset a au moins min_rows lignes
+    # trace : instrumentation optionnelle (voir Trace)
+    start = time.perf_counter()
+    dataset = as_dataset(mushrooms)
+    processes = os.cpu_count() if processes is None else processes
+    if processes > 1 and len(dataset) >= min_rows:
+        r = ParallelBuild(dataset, processes, min_rows, trace).run() # Même arbre que la construction en série
+    else:
+        rows = array("l", dataset.indices()) # Tableau d'indices partagé par tous les noeuds
+        r = build_node(dataset, memoryview(rows), 0, len(rows), dataset.count_edible(), frozenset(), trace, breadth_first=breadth_first)
+    if trace is not None:
+        trace.add("build_decision_tree", start)
     return r
 
-def is_edible(root: Node, mushroom: Mushroom):
+class IncrementalTree:
+# Classe qui maintient un arbre de décision et les statistiques de ses noeuds pour ajouter des lignes
+# Seuls les sous-arbres dont le meilleur attribut ou la pureté change sont reconstruits :
+# l'arbre obtenu est celui que build_decision_tree construirait sur toutes les lignes
+    def __init__(self, mushrooms):
+        dataset = as_dataset(mushrooms)
+        if dataset.rows_ is not None or not isinstance(dataset.edible_, array): # Vue ou cache en lecture seule
+            dataset = dataset.copy()
+        self.dataset = dataset
+        self.regrown = 0 # Nombre de sous-arbres reconstruits
+        self.root = self.grow([], frozenset())
+
+    def grow(self, path: list[tuple[int, int]], used: frozenset):
+    # Méthode qui construit avec statistiques le sous-arbre des lignes vérifiant path (liste de (attribut, code))
+        rows = array("l", range(len(self.dataset)))
+        for position, code in path: # Sélection des lignes du chemin, dans l'ordre du dataset
+            column = self.dataset.columns_[position]
+            rows = array("l", compress(rows, map(code.__eq__, map(column.__getitem__, rows))))
+        edible = sum(map(self.dataset.edible_.__getitem__, rows))
+        return build_node(self.dataset, memoryview(rows), 0, len(rows), edible, used, stats=True)
+
+    def add(self, rows: list[list[str]]):
+    # Méthode qui ajoute des lignes CSV (classe puis valeurs) et met l'arbre à jour, retourne les sous-arbres reconstruits
+        start, regrown = len(self.dataset), self.regrown
+        self.dataset.extend(rows)
+        new = array("l", range(start, len(self.dataset)))
+        if new:
+            self.root = self.update(self.root, new, [], frozenset())
+        return self.regrown - regrown
+
+    def update(self, node: Node, new: array, path: list, used: frozenset):
+    # Méthode qui met à jour un noeud interne et ses descendants avec leurs nouvelles lignes, retourne le noeud (ou son remplaçant)
+    # Les enfants à mettre à jour attendent dans une pile de travail (pas de récursion, profondeur quelconque)
+        dataset, tree = self.dataset, [node] # Emplacement de la racine
+        work = [(tree, 0, new, path, used)] # (enfants du parent, indice, nouvelles lignes, chemin, attributs utilisés)
+        while work:
+            parent, index, new, path, used = work.pop()
+            node = parent[index]
+            stats = node.stats_
+            classes = list(map(dataset.edible_.__getitem__, new))
+            stats[0] += len(classes)
+            stats[1] += sum(classes)
+            total, edible, positions, tables = stats
+            for position, (totals, edibles) in zip(positions, tables): # Mise à jour des tables de contingence
+                codes = list(map(dataset.columns_[position].__getitem__, new))
+                totals.update(codes)
+                edibles.update(compress(codes, classes))
+            h = entropy_from_counts(edible, total)
+            best = select_split([(gain_from_table(table, total, h), table) for table in tables])
+            position = positions[best]
+            if dataset.attributes_[position] != node.criterion_: # Le meilleur attribut change : reconstruction
+                self.regrown += 1
+                parent[index] = self.grow(path, used)
+                continue
+            totals, edibles = tables[best]
+            column, codes = dataset.columns_[position], dataset.codes_[position]
+            children = {codes[label]: child for label, child in zip(node.labels_, node.children_)}
+            groups = {} # Nouvelles lignes de chaque enfant
+            for i in new:
+                groups.setdefault(column[i], array("l")).append(i)
+            vocabulary, child_used, pending = dataset.vocabularies_[position], used | {position}, []
+            for code, rows in groups.items():
+                count, yes = totals[code], edibles[code]
+                child, child_path = children.get(code), path + [(position, code)]
+                if yes == 0 or yes == count: # Sous ensemble pur : feuille
+                    if child is None or not child.is_leaf() or (child.criterion_ == "Yes") != (yes > 0):
+                        child = Node("Yes" if yes else "No", True)
+                    child.stats_ = [count, yes]
+                elif child is None or child.is_leaf(): # Sous ensemble devenu impur ou nouvelle valeur
+                    self.regrown += 1
+                    child = self.grow(child_path, child_used)
+                else: # Enfant mis à jour plus tard, à sa place dans les arêtes
+                    pending.append((code, rows, child_path))
+                children[code] = child
+            order = sorted(children) # Arêtes dans l'ordre des codes, comme build_node
+            node.labels_, node.children_ = [vocabulary[code] for code in order], [children[code] for code in order]
+            for code, rows, child_path in reversed(pending): # Premier enfant mis à jour en premier
+                work.append((node.children_, order.index(code), rows, child_path, child_used))
+        return tree[0]
+
+def run_fold(dataset: Dataset, folds, fold: int):
+# Fonction qui entraîne un arbre sans le pli fold puis évalue ce pli, retourne précision, confusion et temps
+    start = time.perf_counter()
+    train = array("l", compress(range(len(folds)), map(fold.__ne__, folds)))
+    test = array("l", compress(range(len(folds)), map(fold.__eq__, folds)))
+    edible = sum(map(dataset.edible_.__getitem__, train))
+    tree = build_node(dataset, memoryview(train), 0, len(train), edible, frozenset(), path=frozenset()) # Plis entiers
+    built = time.perf_counter()
+    predictions = is_edible_batch(tree, dataset.take(test))
+    confusion = Counter(zip(map(dataset.edible_.__getitem__, test), predictions)) # (réel, prédit) -> nombre
+    return {
+        "fold": fold, "train": len(train), "test": len(test),
+        "accuracy": (confusion[1, 1] + confusion[0, 0]) / len(test),
+        "confusion": {"true_edible": confusion[1, 1], "false_poisonous": confusion[1, 0],
+                      "false_edible": confusion[0, 1], "true_poisonous": confusion[0, 0]},
+        "build_seconds": built - start, "predict_seconds": time.perf_counter() - built,
+    }
+
+def init_fold_worker(name: str, attributes: list[str], vocabularies: list[list], formats: str, total: int, size: int,
+                     maxsize: int):
+# Fonction qui rattache un processus de validation croisée à la mémoire partagée, avec sa propre cache si maxsize
+    init_worker(name, attributes, vocabularies, formats, total, size)
+    if maxsize:
+        cache = SplitCache(maxsize)
+        cache.set_groups(worker["dataset"], worker["rows"]) # Numéro de pli de chaque ligne
+        set_split_cache(cache)
+
+def fold_task(fold: int):
+# Fonction exécutée par un processus : évaluation d'un pli sur le dataset partagé
+# Les compteurs de la cache du processus pendant ce pli sont retournés sous "split_cache"
+    cache = split_cache
+    before = cache.stats() if cache is not None else None
+    result = run_fold(worker["dataset"], worker["rows"], fold)
+    if cache is not None:
+        result["split_cache"] = {name: cache.stats()[name] - before[name] for name in ("hits", "misses", "evictions")}
+    return result
+
+def cross_validate(mushrooms, folds: int=10, processes: int=None, seed: int=0):
+# Fonction qui évalue build_decision_tree par validation croisée à folds plis, les plis tournent en parallèle
+# Le dataset encodé et le numéro de pli de chaque ligne sont partagés une seule fois entre les processus
+# Avec une SplitCache active, les tables de chaque pli sont réutilisées par les arbres des autres plis ;
+# chaque processus a sa propre cache (même taille), ses plis sont consécutifs et ses compteurs remontent à la cache active
+    start = time.perf_counter()
+    dataset = as_dataset(mushrooms)
+    if dataset.rows_ is not None: # Une vue est ramenée à ses propres lignes
+        dataset = dataset.copy()
+    if not 2 <= folds <= len(dataset):
+        raise ValueError(f"Nombre de plis invalide : {folds} pour {len(dataset)} champignons")
+    order = list(range(len(dataset)))
+    random.Random(seed).shuffle(order) # Répartition aléatoire reproductible
+    assignment = array("l", bytes(array("l").itemsize * len(dataset)))
+    for rank, i in enumerate(order):
+        assignment[i] = rank % folds
+    processes = min(os.cpu_count() if processes is None else processes, folds)
+    cache = split_cache
+    if processes > 1:
+        memory, views = share_dataset(dataset, assignment)
+        try:
+            initargs = (memory.name, dataset.attributes_, dataset.vocabularies_, dataset.formats(), len(dataset), len(assignment),
+                        cache.maxsize if cache is not None else 0)
+            with multiprocessing.Pool(processes, init_fold_worker, initargs) as pool:
+                results = pool.map(fold_task, range(folds), chunksize=-(-folds // processes))
+        finally:
+            release_shared(memory, views)
+        for result in results:
+            if "split_cache" in result:
+                counters = result.pop("split_cache")
+                cache.hits, cache.misses = cache.hits + counters["hits"], cache.misses + counters["misses"]
+                cache.evictions += counters["evictions"]
+    else:
+        if cache is not None:
+            cache.set_groups(dataset, assignment)
+        try:
+            results = [run_fold(dataset, assignment, fold) for fold in range(folds)]
+        finally:
+            if cache is not None:
+                cache.set_groups(dataset)
+    confusion = Counter()
+    for result in results:
+        confusion.update(result["confusion"])
+    return {
+        "folds": results, "accuracy": sum(result["accuracy"] for result in results) / folds,
+        "confusion": dict(confusion), "seconds": time.perf_counter() - start,
+    }
+
+def unknown_value(default: bool, attribute: str, value: str):
+# Fonction qui applique la politique des valeurs jamais vues lors de l'entraînement
+    if default is None: # Pas de valeur par défaut : erreur explicite
+        if value is None:
+            raise ValueError(f"Valeur absente pour l'attribut '{attribute}'")
+        raise ValueError(f"Valeur inconnue '{value}' pour l'attribut '{attribute}'")
+    return default
+
+def is_edible(root: Node, mushroom: Mushroom, default: bool=False):
     # Fonction qui retourne un booléen sur la comestibilité d'un champignon
+    # default est retourné si une valeur n'a jamais été vue (None pour lever une erreur)
     while not root.is_leaf(): # Tant que le noeud n'est pas une feuille
-        n, i = len(root.edges_), 0
-        finished = False
-        while i < n and not finished: # Parcours des arêtes
-            edge = root.edges_[i]
-            if mushroom.get_attribute(root.criterion_) == edge.get_label(): # Si l'attribut est égal au label
-                root = edge.get_child() # Mise à jour du noeud
-                finished = True
-            i += 1
+        value = mushroom.get_attribute(root.criterion_)
+        child = root.get_child(value) # Arête dont le label est égal à l'attribut
+        if child is None: # Aucune arête ne correspond
+            return unknown_value(default, root.criterion_, value)
+        root = child # Mise à jour du noeud
     return root.criterion_ == "Yes" # Retourne un booléen sur la comestibilité
 
-def display(tree: Node):
-    # Fonction qui affiche un arbre de décision
-    def display_r(node: Node, tab: int=0, tree_str:str=""):
-        # Fonction récursive qui affiche un arbre de décision
-        for edge in node.edges_:  # Parcours des arêtes
-            tree_str += "    "*tab + f"{node.criterion_} = {edge.get_label()}\n"
+class CompiledTree:
+# Classe qui représente un arbre de décision compilé en tableaux plats
+# Le noeud i teste l'attribut features_[i] et son enfant pour le code c est children_[offsets_[i] + c]
+    def __init__(self, attributes: list[str], codes: list[dict], vocabularies: list[list], default: bool=False):
+        self.attributes_ = attributes # Liste des attributs
+        self.positions_ = {attribute: i for i, attribute in enumerate(attributes)}
+        self.codes_ = codes # Valeur -> code pour chaque attribut
+        self.vocabularies_ = vocabularies # Code -> valeur pour chaque attribut
+        self.features_ = array("i") # Position de l'attribut testé par chaque noeud (-1 pour une feuille)
+        self.labels_ = array("b") # 1 si la feuille est comestible, 0 sinon
+        self.offsets_ = array("i", [0]) # Début de la table des enfants de chaque noeud
+        self.children_ = array("i") # Enfant pour chaque code (-1 si la valeur est inconnue)
+        self.default_ = default # Politique des valeurs inconnues
+        self.source_ = None # Codes du dataset d'entraînement, si l'arbre a été compilé avec
+        self.dispatch_ = None # Tables des noeuds pour is_edible (voir dispatch)
+
+    def add_node(self, node: Node):
+    # Méthode qui ajoute un noeud et réserve sa table d'enfants, retourne son indice
+        self.dispatch_ = None # Tables à reconstruire
+        if node.is_leaf():
+            self.features_.append(-1)
+            self.labels_.append(1 if node.criterion_ == "Yes" else 0)
+        else:
+            position = self.positions_.get(node.criterion_)
+            if position is None: # Attribut absent du vocabulaire donné
+                position = self.positions_[node.criterion_] = len(self.attributes_)
+                self.attributes_.append(node.criterion_)
+                self.codes_.append({})
+                self.vocabularies_.append([])
+            codes, vocabulary = self.codes_[position], self.vocabularies_[position]
+            for label in node.labels_: # Ajout des valeurs absentes du vocabulaire
+                if label not in codes:
+                    codes[label] = len(vocabulary)
+                    vocabulary.append(label)
+            self.features_.append(position)
+            self.labels_.append(0)
+            self.children_.extend([-1] * len(codes))
+        self.offsets_.append(len(self.children_))
+        return len(self.features_) - 1
+
+    def dispatch(self):
+    # Méthode qui retourne (et garde) les tables de chaque noeud : enfants par code et enfants par valeur
+        if self.dispatch_ is None:
+            tables, lookups = [], []
+            for node, position in enumerate(self.features_):
+                table = tuple(self.children_[self.offsets_[node]:self.offsets_[node + 1]]) if position >= 0 else ()
+                tables.append(table)
+                vocabulary = self.vocabularies_[position] if position >= 0 else ()
+                lookups.append({vocabulary[code]: child for code, child in enumerate(table) if child >= 0})
+            self.dispatch_ = (tables, lookups)
+        return self.dispatch_
+
+    def is_edible(self, mushroom: Mushroom):
+    # Méthode qui retourne un booléen sur la comestibilité d'un champignon en O(profondeur)
+        features, dispatch = self.features_, self.dispatch_
+        tables, lookups = dispatch if dispatch is not None else self.dispatch()
+        node, position = 0, features[0]
+        if type(mushroom) is Row and mushroom.dataset_.codes_ is self.source_: # Codes du dataset d'entraînement
+            columns, index = mushroom.dataset_.columns_, mushroom.index_
+            while position >= 0: # Tant que le noeud n'est pas une feuille
+                table, code = tables[node], columns[position][index]
+                child = table[code] if code < len(table) else -1
+                if child < 0:
+                    break # Valeur inconnue
+                node, position = child, features[child]
+        else:
+            attributes, get = self.attributes_, mushroom.get_attribute
+            while position >= 0:
+                child = lookups[node].get(get(attributes[position]), -1)
+                if child < 0:
+                    break
+                node, position = child, features[child]
+        if position >= 0:
+            attribute = self.attributes_[position]
+            return unknown_value(self.default_, attribute, mushroom.get_attribute(attribute))
+        return self.labels_[node] == 1
+
+    def to_node(self):
+    # Méthode qui reconstruit l'arbre de noeuds (pour display, boolean_tree ou to_python), arêtes dans l'ordre des codes
+        nodes = [Node(self.attributes_[p], False) if p >= 0 else Node("Yes" if self.labels_[i] else "No", True)
+                 for i, p in enumerate(self.features_)]
+        for i, node in enumerate(nodes):
+            if not node.is_leaf():
+                vocabulary, start = self.vocabularies_[self.features_[i]], self.offsets_[i]
+                for code in range(self.offsets_[i + 1] - start):
+                    child = self.children_[start + code]
+                    if child >= 0:
+                        node.add_edge(vocabulary[code], nodes[child])
+        return nodes[0]
+
+MODEL_MAGIC = b"MUSHROOMS-MODEL1" # Signature des fichiers de modèle
+
+def save_model(tree, path: str, dataset: Dataset=None, default: bool=False):
+# Fonction qui enregistre un arbre (Node ou CompiledTree) sous forme de tableaux plats
+# Avec le dataset d'entraînement, to_node redonne les arêtes dans l'ordre de build_decision_tree
+    compiled = tree if isinstance(tree, CompiledTree) else compile_tree(tree, dataset, default)
+    meta = {"attributes": compiled.attributes_, "vocabularies": compiled.vocabularies_, "default": compiled.default_}
+    write_binary(path, MODEL_MAGIC, meta, [compiled.features_, compiled.labels_, compiled.offsets_, compiled.children_])
+
+def load_model(path: str):
+# Fonction qui charge un modèle sans copie (mmap) sous forme d'arbre compilé, prêt à prédire
+    content = read_binary(path, MODEL_MAGIC)
+    if content is None:
+        raise ValueError(f"'{path}' n'est pas un modèle valide")
+    meta, buffers = content
+    codes = [{value: code for code, value in enumerate(vocabulary)} for vocabulary in meta["vocabularies"]]
+    compiled = CompiledTree(meta["attributes"], codes, meta["vocabularies"], meta["default"])
+    compiled.features_, compiled.labels_, compiled.offsets_, compiled.children_ = buffers # Lecture seule
+    return compiled
+
+def compile_tree(root: Node, dataset: Dataset=None, default: bool=False):
+# Fonction qui compile un arbre de décision en tableaux plats
+# Avec un dataset, les codes de ses colonnes sont réutilisés pour prédire ses lignes sans décodage
+    if dataset is not None:
+        codes, vocabularies = [dict(c) for c in dataset.codes_], [list(v) for v in dataset.vocabularies_] # Copies : add_node y ajoute les labels de l'arbre
+        compiled = CompiledTree(list(dataset.attributes_), codes, vocabularies, default)
+        compiled.source_ = dataset.codes_
+    else:
+        compiled = CompiledTree([], [], [], default)
+    compiled.add_node(root)
+    queue, i = [root], 0
+    while i < len(queue): # Parcours en largeur : les enfants sont ajoutés après leur parent
+        node = queue[i]
+        if not node.is_leaf():
+            codes, start = compiled.codes_[compiled.features_[i]], compiled.offsets_[i]
+            for label, child in zip(node.labels_, node.children_):
+                compiled.children_[start + codes[label]] = compiled.add_node(child)
+                queue.append(child)
+        i += 1
+    return compiled
+
+def child_lookup(compiled: CompiledTree, dataset: Dataset, node: int, translations: dict):
+# Fonction qui retourne la table code du dataset -> enfant (-1 si inconnu) d'un noeud interne
+    position = compiled.features_[node]
+    if position not in translations: # Code du dataset -> code de l'arbre, calculé une fois par attribut
+        codes, attribute = compiled.codes_[position], compiled.attributes_[position]
+        if compiled.source_ is dataset.codes_: # Mêmes codes que le dataset d'entraînement
+            translations[position] = range(len(dataset.vocabulary(attribute)))
+        else: # Traduction via les valeurs
+            translations[position] = [codes.get(value, -1) for value in dataset.vocabulary(attribute)]
+    start, end = compiled.offsets_[node], compiled.offsets_[node + 1]
+    table = compiled.children_[start:end]
+    return [table[code] if 0 <= code < end - start else -1 for code in translations[position]]
+
+def predict_dataset(compiled: CompiledTree, dataset: Dataset, leaf_hits: Counter=None):
+# Fonction qui prédit toutes les lignes d'un dataset en les faisant descendre l'arbre niveau par niveau
+    base = dataset.indices()
+    predictions = array("B", bytes(len(base)))
+    translations = {}
+    level = [(0, range(len(base)))] # Noeuds du niveau courant et positions des lignes qui y arrivent
+    while level:
+        next_level = []
+        for node, positions in level:
+            position = compiled.features_[node]
+            if position < 0: # Feuille : toutes ses lignes reçoivent son label
+                if compiled.labels_[node]:
+                    deque(map(predictions.__setitem__, positions, repeat(1)), maxlen=0) # Affectations sans boucle python
+                if leaf_hits is not None:
+                    leaf_hits[node] += len(positions)
+                continue
+            attribute = compiled.attributes_[position]
+            if attribute not in dataset.positions_: # Attribut absent de toutes les lignes : valeur inconnue
+                if unknown_value(compiled.default_, attribute, None):
+                    deque(map(predictions.__setitem__, positions, repeat(1)), maxlen=0)
+                continue
+            column, lookup = dataset.column(attribute), child_lookup(compiled, dataset, node, translations)
+            rows = positions if dataset.rows_ is None else map(base.__getitem__, positions) # Indices dans les colonnes
+            buckets = [[] for _ in lookup] # Positions des lignes de chaque code, remplies en un seul passage
+            appends = [bucket.append for bucket in buckets]
+            for i, code in zip(positions, map(column.__getitem__, rows)):
+                appends[code](i)
+            for code, selected in enumerate(buckets):
+                if not selected:
+                    continue
+                child = lookup[code]
+                if child >= 0:
+                    next_level.append((child, selected))
+                elif unknown_value(compiled.default_, attribute, dataset.vocabulary(attribute)[code]): # Valeur inconnue
+                    deque(map(predictions.__setitem__, selected, repeat(1)), maxlen=0)
+        level = next_level
+    return predictions
+
+def is_edible_batch(tree, mushrooms, default: bool=False, leaf_hits: Counter=None, chunk_size: int=4096):
+# Fonction qui retourne la comestibilité (tableau de 0/1) de tous les champignons d'un dataset
+# mushrooms peut être un dataset, une liste de champignons ou des lignes CSV (en-tête compris, comme load_dataset)
+# Un attribut absent d'un champignon mais testé par l'arbre est traité comme une valeur inconnue (voir default)
+# leaf_hits, si donné, compte les lignes arrivées dans chaque feuille (indices de l'arbre compilé)
+    compiled = tree if isinstance(tree, CompiledTree) else None
+    if not isinstance(mushrooms, Dataset):
+        mushrooms = iter(mushrooms)
+        first = next(mushrooms, None)
+        if first is None:
+            return array("B")
+        if isinstance(first, (list, tuple)): # Lignes CSV : encodage et prédiction par morceaux
+            predictions = array("B")
+            for chunk in is_edible_chunks(tree, chain([first], mushrooms), default, leaf_hits, chunk_size):
+                predictions.extend(chunk)
+            return predictions
+        mushrooms = as_dataset([first, *mushrooms])
+    if compiled is None:
+        compiled = compile_tree(tree, mushrooms, default)
+    return predict_dataset(compiled, mushrooms, leaf_hits)
+
+def is_edible_chunks(tree, source, default: bool=False, leaf_hits: Counter=None, chunk_size: int=4096):
+# Fonction génératrice qui prédit un fichier CSV (chemin) ou des lignes CSV morceau par morceau
+    compiled = tree if isinstance(tree, CompiledTree) else compile_tree(tree, default=default)
+    chunks = read_chunks(source, chunk_size) if isinstance(source, str) else encode_chunks(source, chunk_size)
+    for dataset in chunks:
+        yield predict_dataset(compiled, dataset, leaf_hits)
+
+class ScoringServer:
+# Classe qui sert les prédictions d'un arbre chargé une seule fois, sur un socket TCP local (une requête par ligne)
+# Requête : un objet JSON (attribut -> valeur), une liste d'objets JSON, ou une ligne CSV dans l'ordre de attributes_
+# (classe en première colonne facultative) ; "STATS" retourne les compteurs. Réponse : une ligne JSON, ou Yes/No pour le CSV
+# Les requêtes concurrentes (connexions différentes ou lignes envoyées à la suite) sont regroupées en lots d'au plus
+# max_batch lignes, attendus au plus max_delay secondes, et prédits par une seule descente de l'arbre (predict_dataset)
+# Une valeur inconnue ou absente reçoit default ; avec default=None, seule la requête de la ligne concernée échoue
+# Une ligne de plus de limit octets reçoit une erreur, la connexion continue
+    def __init__(self, tree, dataset: Dataset=None, default: bool=False, max_batch: int=1024, max_delay: float=0.002,
+                 limit: int=2**22):
+        compiled = tree if isinstance(tree, CompiledTree) else compile_tree(tree, dataset, default)
+        self.compiled = CompiledTree.__new__(CompiledTree) # Copie : politique et codes propres au serveur
+        self.compiled.__dict__.update(compiled.__dict__)
+        self.compiled.default_ = False if default is None else default # Lots jamais interrompus par une valeur inconnue
+        self.strict = None # Sans valeur par défaut : arbre qui reprend une à une les lignes aux valeurs inconnues
+        if default is None:
+            self.strict = CompiledTree.__new__(CompiledTree)
+            self.strict.__dict__.update(compiled.__dict__)
+            self.strict.default_ = None
+        self.attributes_ = list(compiled.attributes_)
+        self.schema = Dataset(self.attributes_) # Codes de l'arbre, plus un code réservé aux valeurs inconnues
+        self.schema.codes_ = list(compiled.codes_)
+        self.schema.vocabularies_ = [list(vocabulary) + [None] for vocabulary in compiled.vocabularies_]
+        self.compiled.source_ = self.schema.codes_ # Lots encodés avec les codes de l'arbre : pas de traduction
+        self.unknown = [len(vocabulary) - 1 for vocabulary in self.schema.vocabularies_]
+        self.used = sorted({p for p in compiled.features_ if p >= 0}) # Seules colonnes encodées
+        self.row_schema = get_schema(self.attributes_) # Schéma des champignons repris une à une
+        self.max_batch, self.max_delay, self.limit = max_batch, max_delay, limit
+        self.queue, self.server, self.batch_task = None, None, None
+        self.connections = {} # Tâche -> flux d'écriture de chaque connexion ouverte
+        self.requests, self.rows, self.batches, self.errors = 0, 0, 0, 0
+        self.latency, self.latencies = 0.0, deque(maxlen=10000) # Somme et dernières latences (secondes)
+        self.started = time.perf_counter()
+
+    def parse(self, line: str):
+    # Méthode qui retourne les lignes (valeurs dans l'ordre des attributs) et le format d'une requête
+        if line[:1] in ("{", "["):
+            data = json.loads(line)
+            objects = [data] if isinstance(data, dict) else data
+            if not isinstance(objects, list) or not all(isinstance(o, dict) for o in objects):
+                raise ValueError("JSON attendu : un objet ou une liste d'objets attribut -> valeur")
+            rows = [[value if isinstance(value := o.get(a), str) else None for a in self.attributes_] for o in objects]
+            return rows, "object" if isinstance(data, dict) else "list"
+        values = next(csv.reader([line]), [])
+        if len(values) == len(self.attributes_) + 1: # Classe en première colonne, comme dans les fichiers CSV
+            values = values[1:]
+        elif len(values) != len(self.attributes_):
+            raise ValueError(f"{len(values)} valeurs pour {len(self.attributes_)} attributs")
+        return [values], "csv"
+
+    def encode(self, rows: list[list[str]]):
+    # Méthode qui encode un lot de lignes dans un dataset aux codes de l'arbre
+        dataset = self.schema.new_chunk()
+        dataset.edible_ = array("B", bytes(len(rows)))
+        for position in self.used: # Les colonnes non testées par l'arbre restent vides
+            get, unknown = self.schema.codes_[position].get, self.unknown[position]
+            dataset.columns_[position] = array(column_typecode(unknown + 1), [get(row[position], unknown) for row in rows])
+        return dataset
+
+    def predict(self, items: list):
+    # Méthode qui prédit un lot de requêtes (lignes, future) en une seule descente de l'arbre
+        rows = [row for batch, _ in items for row in batch]
+        errors = {} # Indice de ligne -> erreur de sa valeur inconnue
+        try:
+            dataset = self.encode(rows)
+            predictions = predict_dataset(self.compiled, dataset)
+            if self.strict is not None:
+                for i in self.unknown_rows(dataset):
+                    try: # Valeur inconnue testée ou non par l'arbre : reprise avec les valeurs de la requête
+                        predictions[i] = self.strict.is_edible(Mushroom(False, self.row_schema, rows[i]))
+                    except ValueError as error:
+                        errors[i] = error
+        except Exception as error: # Le lot échoue, le serveur continue
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        self.batches += 1
+        self.rows += len(rows)
+        start = 0
+        for batch, future in items:
+            if not future.done(): # Client déconnecté entre temps
+                error = next((errors[i] for i in range(start, start + len(batch)) if i in errors), None) if errors else None
+                if error is None:
+                    future.set_result(predictions[start:start + len(batch)])
+                else:
+                    future.set_exception(error)
+            start += len(batch)
+
+    def unknown_rows(self, dataset: Dataset):
+    # Méthode qui retourne les indices des lignes d'un lot ayant une valeur inconnue dans une colonne encodée
+        rows = set()
+        for position in self.used:
+            column, unknown = dataset.columns_[position], self.unknown[position]
+            if unknown in column: # Recherche en C, parcours seulement si une valeur est inconnue
+                rows.update(compress(range(len(column)), map(unknown.__eq__, column)))
+        return sorted(rows)
+
+    async def batcher(self):
+    # Méthode qui regroupe les requêtes en attente en lots : premier arrivé, puis attente d'au plus max_delay
+        while True:
+            items = [await self.queue.get()]
+            size = len(items[0][0])
+            for delay in (0, self.max_delay): # Requêtes déjà arrivées, puis celles arrivées pendant l'attente
+                if delay:
+                    await asyncio.sleep(delay)
+                while size < self.max_batch and not self.queue.empty():
+                    items.append(self.queue.get_nowait())
+                    size += len(items[-1][0])
+                if size >= self.max_batch or not self.max_delay:
+                    break
+            self.predict(items)
+
+    async def score(self, rows: list[list[str]]):
+    # Méthode qui ajoute des lignes au prochain lot et attend leurs prédictions
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((rows, future))
+        return await future
+
+    async def respond(self, line: bytes):
+    # Méthode qui retourne la réponse à une ligne reçue, une erreur JSON si elle est invalide
+        try:
+            line = line.decode("UTF-8").strip()
+        except UnicodeDecodeError:
+            self.errors += 1
+            return json.dumps({"error": "Requête qui n'est pas en UTF-8"})
+        if line == "STATS":
+            return json.dumps(self.stats())
+        start = time.perf_counter()
+        try:
+            rows, kind = self.parse(line)
+            predictions = await self.score(rows) if rows else []
+        except ValueError as error:
+            self.errors += 1
+            return json.dumps({"error": str(error)})
+        elapsed = time.perf_counter() - start
+        self.requests += 1
+        self.latency += elapsed
+        self.latencies.append(elapsed)
+        if kind == "csv":
+            return "Yes" if predictions[0] else "No"
+        edible = [p == 1 for p in predictions]
+        return json.dumps({"edible": edible[0] if kind == "object" else edible})
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    # Méthode qui traite une connexion : les lignes sont prédites en parallèle, les réponses envoyées dans l'ordre
+        responses = asyncio.Queue()
+        async def send():
+            while (response := await responses.get()) is not None: # Tâche, ou erreur déjà prête
+                writer.write((response if isinstance(response, str) else await response).encode("UTF-8") + b"\n")
+                await writer.drain()
+        sender = asyncio.create_task(send())
+        self.connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    line = await self.read_line(reader)
+                except ValueError as error: # Ligne trop longue, ignorée
+                    self.errors += 1
+                    responses.put_nowait(json.dumps({"error": str(error)}))
+                    continue
+                if not line:
+                    break
+                if line.strip():
+                    responses.put_nowait(asyncio.create_task(self.respond(line)))
+            responses.put_nowait(None)
+            await sender
+        finally:
+            sender.cancel()
+            writer.close()
+            del self.connections[asyncio.current_task()]
+
+    async def read_line(self, reader: asyncio.StreamReader):
+    # Méthode qui lit une ligne d'une connexion (b"" à la fin), ValueError si elle dépasse limit octets
+    # Le tampon est limité à limit octets : une ligne trop longue est lue par morceaux jusqu'à sa fin, puis ignorée
+        try:
+            return await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as error: # Dernière ligne sans fin de ligne, ou fin de connexion
+            return error.partial
+        except asyncio.LimitOverrunError as error:
+            consumed = error.consumed
+        while True:
+            await reader.readexactly(consumed) # Morceau déjà dans le tampon
+            try:
+                await reader.readuntil(b"\n")
+                break
+            except asyncio.IncompleteReadError:
+                break
+            except asyncio.LimitOverrunError as error:
+                consumed = error.consumed
+        raise ValueError(f"Ligne de plus de {self.limit} octets")
+
+    async def start(self, host: str="127.0.0.1", port: int=0):
+    # Méthode qui démarre le serveur (port 0 : port libre), retourne le port
+        self.queue = asyncio.Queue()
+        self.batch_task = asyncio.create_task(self.batcher())
+        self.server = await asyncio.start_server(self.handle, host, port, limit=self.limit)
+        self.started = time.perf_counter()
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+    # Méthode qui arrête le serveur après avoir fermé les connexions ouvertes
+        self.server.close()
+        for writer in self.connections.values(): # Fin de lecture des connexions, qui se terminent
+            writer.close()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        await self.server.wait_closed()
+        self.batch_task.cancel()
+
+    def stats(self):
+    # Méthode qui retourne les compteurs du serveur (latences en millisecondes, sur les dernières requêtes pour les quantiles)
+        elapsed = time.perf_counter() - self.started
+        latencies = sorted(self.latencies)
+        quantile = lambda q: 1000 * latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+        return {
+            "requests": self.requests, "rows": self.rows, "batches": self.batches, "errors": self.errors,
+            "rows_per_batch": self.rows / self.batches if self.batches else None,
+            "requests_per_second": self.requests / elapsed, "rows_per_second": self.rows / elapsed,
+            "latency_ms": {"mean": 1000 * self.latency / self.requests if self.requests else None,
+                           "p50": quantile(0.5), "p99": quantile(0.99), "max": 1000 * latencies[-1] if latencies else None},
+        }
+
+class Writer:
+# Classe qui accumule les fragments de texte des exports dans une liste ou les écrit directement dans un fichier
+    def __init__(self, file=None):
+        self.parts = [] # Fragments accumulés si aucun fichier n'est donné
+        self.write = self.parts.append if file is None else file.write
+
+    def getvalue(self):
+    # Méthode qui retourne le texte accumulé (une seule concaténation)
+        return "".join(self.parts)
+
+def display_r(node: Node, writer: Writer, tab: int=0):
+    # Fonction qui affiche un arbre de décision, avec une pile d'arêtes restantes au lieu de la récursion
+    stack = [zip(node.labels_, node.children_)] # Arêtes restantes de chaque noeud du chemin
+    criteria = [node.criterion_]
+    while stack:
+        depth = tab + len(stack) - 1
+        for label, child in stack[-1]:  # Parcours des arêtes
+            writer.write("    "*depth + f"{criteria[-1]} = {label}\n")
             # Affichage du critère et du label de l'arête
-            child = edge.get_child()
             if not child.is_leaf(): # Si le noeud n'est pas une feuille
-                tree_str += display_r(child, tab+1) # Appel récursif
-            else:
-                tree_str += "    "*(tab+1) + child.criterion_ + "\n"
-                # Affichage de la comestibilité d'feuille
-        return tree_str
-    tree_str = display_r(tree) # Affichage de l'arbre
-    print(tree_str) # Affichage de l'arbre
+                stack.append(zip(child.labels_, child.children_)) # Le noeud enfant est parcouru avant les arêtes suivantes
+                criteria.append(child.criterion_)
+                break
+            writer.write("    "*(depth+1) + child.criterion_ + "\n")
+            # Affichage de la comestibilité d'feuille
+        else: # Toutes les arêtes du noeud ont été affichées
+            stack.pop()
+            criteria.pop()
+
+def display(tree: Node, file=None, echo: bool=True):
+    # Fonction qui affiche un arbre de décision
+    # Avec file, l'arbre est écrit au fur et à mesure dans le fichier et rien n'est retourné
+    if file is not None:
+        display_r(tree, Writer(file))
+        return None
+    writer = Writer()
+    display_r(tree, writer) # Affichage de l'arbre
+    tree_str = writer.getvalue()
+    if echo:
+        print(tree_str) # Affichage de l'arbre
     return tree_str
 
-def print_not_leaf(bt: BooleanTree, tree: str=""):
-    # Fonction qui affiche un noeud non feuille
-    node, edges, tab = bt.node, bt.edges_, bt.tab
-    amount_or, child, edge = bt.amount_or, bt.get_edge_child(), bt.edge
-    par = len([i.get_child().criterion_ != "No" for i in child.edges_]) > 1
+def print_not_leaf(bt: BooleanTree, writer: Writer):
+    # Fonction qui affiche le début d'un noeud non feuille et retourne le noeud enfant à parcourir
+    node, tab = bt.node, bt.tab
+    child, edge = bt.get_edge_child(), bt.edge
+    par = len(child.labels_) > 1
     # Récupération des données nécessaires via la classe BooleanTree
-    tree += f"({node.criterion_} = {edge.get_label()}" # Affichage du critère et du label de l'arête
-    tree += " AND (\n" if par else " AND \n" # Affichage du "AND" si le noeud a plusieurs enfants
-    tree += boolean_tree_r(BooleanTree(child, tab+1)) # Appel récursif
-    tree += (")" if par else "") + (") OR " if amount_or < len(edges) else ")")
+    writer.write(f"({node.criterion_} = {edge.get_label()}") # Affichage du critère et du label de l'arête
+    writer.write(" AND (\n" if par else " AND \n") # Affichage du "AND" si le noeud a plusieurs enfants
+    return BooleanTree(child, tab+1)
+
+def close_not_leaf(bt: BooleanTree, writer: Writer):
+    # Fonction qui affiche la fin d'un noeud non feuille, une fois son enfant parcouru
+    edges, tab, amount_or = bt.edges_, bt.tab, bt.amount_or
+    par = len(bt.get_edge_child().labels_) > 1
+    writer.write((")" if par else "") + (") OR " if amount_or < len(edges) else ")"))
     # Affichage de la parenthèse fermante et du "OR" si le noeud a plusieurs enfants
-    tree += "\n" + "    "*tab # Retour à la ligne et indentation
-    return tree
+    writer.write("\n" + "    "*tab) # Retour à la ligne et indentation
 
-def print_leaf(bt: BooleanTree, tree: str=""):
+def print_leaf(bt: BooleanTree, writer: Writer):
     # Fonction qui affiche une feuille
     node, edges, tab = bt.node, bt.edges_, bt.tab
     amount_or, edge = bt.amount_or, bt.edge
     # Récupération des données nécessaires via la classe BooleanTree
-    tree += f"({node.criterion_} = {edge.get_label()})" # Affichage du critère et du label de l'arête
-    tree += " OR " if amount_or < len(edges) else "" # Affichage du "OR" si le noeud a plusieurs enfants
+    writer.write(f"({node.criterion_} = {edge.get_label()})") # Affichage du critère et du label de l'arête
+    writer.write(" OR " if amount_or < len(edges) else "") # Affichage du "OR" si le noeud a plusieurs enfants
     n = amount_or < len(edges)-1 and edges[amount_or].get_child().criterion_ == "Yes"
-    tree += "\n" + "    "*tab if n and amount_or % 2 == 0 else ""
+    writer.write("\n" + "    "*tab if n and amount_or % 2 == 0 else "")
     # Retour à la ligne et indentation pour renre l'affichage plus lisible
-    return tree
 
-def boolean_tree_r(bt: BooleanTree, tree: str=""):
-    # Fonction récursive qui affiche un arbre booléen
-    tree += "    "*bt.tab # Indentation
-    for bt.amount_or, bt.edge in enumerate(bt.edges_): # Parcours des arêtes
-        bt.amount_or += 1
-        child = bt.get_edge_child()
-        if not child.is_leaf(): # Si ce n'est pas une feuille
-            tree += print_not_leaf(bt) # Appel à la fonction qui print une arête
-        elif child.criterion_ == "Yes":
-            tree += print_leaf(bt) # Appel à la fonction qui print une feuille
-    return tree
+def boolean_tree_r(bt: BooleanTree, writer: Writer):
+    # Fonction qui affiche un arbre booléen, avec une pile de noeuds au lieu de la récursion
+    writer.write("    "*bt.tab) # Indentation
+    stack = [(bt, enumerate(bt.edges_, 1))] # Noeuds du chemin et leurs arêtes restantes
+    while stack:
+        bt, edges = stack[-1]
+        for bt.amount_or, bt.edge in edges: # Parcours des arêtes
+            child = bt.get_edge_child()
+            if not child.is_leaf(): # Si ce n'est pas une feuille
+                child_bt = print_not_leaf(bt, writer) # Appel à la fonction qui print une arête
+                writer.write("    "*child_bt.tab) # Indentation
+                stack.append((child_bt, enumerate(child_bt.edges_, 1))) # L'enfant est parcouru avant les arêtes suivantes
+                break
+            elif child.criterion_ == "Yes":
+                print_leaf(bt, writer) # Appel à la fonction qui print une feuille
+        else: # Toutes les arêtes du noeud ont été parcourues
+            stack.pop()
+            if stack:
+                close_not_leaf(stack[-1][0], writer) # Fin de l'arête du parent
 
-def boolean_tree(root: Node):
+def boolean_tree(root: Node, file=None, echo: bool=True):
     # Fonction qui crée et renvoie un arbre booléen
-    tree = "(" + boolean_tree_r(BooleanTree(root)) + ")"
+    # Avec file, l'arbre est écrit au fur et à mesure dans le fichier et rien n'est retourné
+    writer = Writer(file)
+    writer.write("(")
+    boolean_tree_r(BooleanTree(root), writer)
+    writer.write(")")
     # Appel à la fonction récursive créatrice de l'arbre booléen
-    print(tree)
+    if file is not None:
+        return None
+    tree = writer.getvalue()
+    if echo:
+        print(tree)
     return tree
 
-def print_criterions(ps: PythonScript, script: str=""):
+def print_criterions(ps: PythonScript, writer: Writer):
     # Fonction qui print les critères des feuilles
     tab, node, leaves, if_ = ps.tab, ps.node, ps.leaves, ps.if_
     criterions = False
     # Récupération des données nécessaires via la classe PythonScript
     if len(leaves) > 3: # Si le nombre de feuilles est supérieur à 3
-        script += "    "*tab + f"criterions = {leaves}\n"
+        writer.write("    "*tab + f"criterions = {leaves}\n")
         criterions = True # On met les critères dans une liste
-    script += "    "*tab + ("elif" if if_ and not criterions else "if")
+    writer.write("    "*tab + ("elif" if if_ and not criterions else "if"))
     ps.if_, if_ = True, True
     if len(leaves) == 1: # Si le nombre de feuilles est égal à 1
-        script += f" mushroom.get_attribute('{node.criterion_}') == '{leaves[0]}':\n"
+        writer.write(f" mushroom.get_attribute('{node.criterion_}') == '{leaves[0]}':\n")
     elif len(leaves) > 0: # Si le nombre de feuilles est supérieur à 0, on regarde si on a mis les critères dans la liste
-        script += f" mushroom.get_attribute('{node.criterion_}')"
-        script += " in criterions:\n" if criterions else f" in {leaves}:\n"
+        writer.write(f" mushroom.get_attribute('{node.criterion_}')")
+        writer.write(" in criterions:\n" if criterions else f" in {leaves}:\n")
         ps.clear_leaves()
-    script += "    "*(tab+1) + "return True\n"
-    return script
+    writer.write("    "*(tab+1) + "return True\n")
 
-def print_if_not_leaves(ps: PythonScript, script: str=""):
+def print_if_not_leaves(ps: PythonScript, writer: Writer):
     # Fonction qui print la condition si le noeud n'est pas une feuille
     tab, node, edge, if_ = ps.tab, ps.node, ps.edge, ps.if_
-    script += "    "*tab + ("elif" if if_ else "if") # Affichage du "elif" ou du "if"
-    script += f" mushroom.get_attribute('{node.criterion_}') == '{edge.get_label()}':\n"
-    return script
-
-def to_python_r(ps: PythonScript, script: str=""):
-    # Fonction récursive qui crée un script python
-    for edge in ps.edges_: # Parcours des arêtes
-        ps.edge = edge
-        child = ps.edge_get_child()
-        if not child.is_leaf(): # Si le noeud n'est pas une feuille
-            script += print_if_not_leaves(ps) # Appel à la fonction qui print la condition
-            script += to_python_r(PythonScript(child, ps.tab+1)) # Appel récursif
-        elif child.criterion_ == 'Yes':
+    writer.write("    "*tab + ("elif" if if_ else "if")) # Affichage du "elif" ou du "if"
+    writer.write(f" mushroom.get_attribute('{node.criterion_}') == '{edge.get_label()}':\n")
+
+def to_python_r(ps: PythonScript, writer: Writer):
+    # Fonction qui crée un script python, avec une pile de noeuds au lieu de la récursion
+    stack = [(ps, iter(ps.edges_))] # Noeuds du chemin et leurs arêtes restantes
+    while stack:
+        ps, edges = stack[-1]
+        for ps.edge in edges: # Parcours des arêtes
+            child = ps.edge_get_child()
+            if not child.is_leaf(): # Si le noeud n'est pas une feuille
+                print_if_not_leaves(ps, writer) # Appel à la fonction qui print la condition
+                child_ps = PythonScript(child, ps.tab+1)
+                stack.append((child_ps, iter(child_ps.edges_))) # L'enfant est parcouru avant les arêtes suivantes
+                break
+            elif child.criterion_ == 'Yes':
                 ps.leaves_append() # Ajout d'une feuille dans la liste
-    script += print_criterions(ps) # Appel à la fonction qui print les valeurs des feuilles comesibles
-    return script
+        else: # Toutes les arêtes du noeud ont été parcourues
+            stack.pop()
+            print_criterions(ps, writer) # Appel à la fonction qui print les valeurs des feuilles comesibles
+
+FAST_MAX_DEPTH = 50 # Profondeur au-delà de laquelle to_python_fast écrit des tables (limite d'indentation de python)
+
+def fast_branches(compiled: CompiledTree, tab: int, encoded: bool, constants: list, lines: list):
+    # Fonction qui écrit les tests de l'arbre compilé en ligne droite : une lecture par attribut, un frozenset pour les feuilles comestibles
+    # Les noeuds à écrire et les lignes qui les suivent attendent dans une pile de travail (pas de récursion)
+    work = [(0, tab)] # (noeud ou ligne déjà écrite, indentation)
+    while work:
+        node, tab = work.pop()
+        if isinstance(node, str):
+            lines.append(node)
+            continue
+        position = compiled.features_[node]
+        start, end = compiled.offsets_[node], compiled.offsets_[node + 1]
+        vocabulary, variable = compiled.vocabularies_[position], f"v{position}"
+        keys = list(range(end - start)) if encoded else vocabulary[:end - start] # Codes ou valeurs des arêtes
+        read = f"values[{position}]" if encoded else f"get({compiled.attributes_[position]!r})"
+        lines.append("    "*tab + f"{variable} = {read}") # Attribut lu une seule fois
+        children = [(key, compiled.children_[start + code]) for code, key in enumerate(keys) if compiled.children_[start + code] >= 0]
+        yes = [key for key, child in children if compiled.features_[child] < 0 and compiled.labels_[child]]
+        if len(yes) == 1:
+            lines.append("    "*tab + f"if {variable} == {yes[0]!r}:\n" + "    "*(tab+1) + "return True")
+        elif yes: # Ensemble précalculé au chargement du module
+            name = f"_{'C' if encoded else 'Y'}{node}"
+            constants.append(f"{name} = frozenset({{{', '.join(map(repr, sorted(yes)))}}})") # Ordre stable du texte généré
+            lines.append("    "*tab + f"if {variable} in {name}:\n" + "    "*(tab+1) + "return True")
+        pending = []
+        for key, child in children:
+            if compiled.features_[child] >= 0: # Noeud interne
+                pending += [("    "*tab + f"if {variable} == {key!r}:", tab), (child, tab+1)]
+        pending.append(("    "*tab + "return False", tab))
+        work.extend(reversed(pending))
+
+def compiled_depth(compiled: CompiledTree):
+    # Fonction qui retourne le nombre de noeuds internes du plus long chemin d'un arbre compilé
+    depths = [0] * len(compiled.features_) # Noeuds en largeur : un parent avant ses enfants
+    for node, position in enumerate(compiled.features_):
+        if position >= 0:
+            for child in compiled.children_[compiled.offsets_[node]:compiled.offsets_[node + 1]]:
+                if child >= 0:
+                    depths[child] = depths[node] + 1
+    return max((depth + 1 for depth, position in zip(depths, compiled.features_) if position >= 0), default=0)
 
-def to_python(dt: Node, path: str):
+def to_python_fast(dt: Node, dataset: Dataset=None):
+    # Fonction qui retourne un module python autonome optimisé pour le débit
+    # Jusqu'à FAST_MAX_DEPTH niveaux, les tests sont écrits en ligne droite ; au-delà, l'arbre compilé est écrit
+    # en tables parcourues par une boucle : pas d'imbrication, profondeur quelconque
+    # Avec un dataset, is_edible_values accepte directement les codes de ses colonnes
+    compiled = compile_tree(dt, dataset)
+    header = [
+        "# Module généré par project.to_python_fast, sans dépendance",
+        f"ATTRIBUTES = {tuple(compiled.attributes_)!r}",
+        f"VOCABULARIES = {tuple(tuple(v) for v in compiled.vocabularies_)!r}",
+        f"USED = {tuple(sorted(set(p for p in compiled.features_ if p >= 0)))!r}",
+        "_CODES = tuple({value: code for code, value in enumerate(vocabulary)} for vocabulary in VOCABULARIES)",
+    ]
+    footer = [
+        "def encode(mushroom):",
+        "    # Tuple des codes d'un champignon pour is_edible_values (-1 pour une valeur inconnue ou non utilisée)",
+        "    values = [-1] * len(ATTRIBUTES)",
+        "    for position in USED:",
+        "        values[position] = _CODES[position].get(mushroom.get_attribute(ATTRIBUTES[position]), -1)",
+        "    return tuple(values)",
+        "",
+        "def is_edible_batch(rows):",
+        "    # Comestibilité d'une suite de tuples de codes",
+        "    return list(map(is_edible_values, rows))",
+        "",
+    ]
+    if compiled_depth(compiled) <= FAST_MAX_DEPTH:
+        constants, labels, codes = [], [], []
+        if compiled.features_[0] < 0: # L'arbre est une seule feuille
+            labels.append(f"    return {compiled.labels_[0] == 1}")
+            codes.append(f"    return {compiled.labels_[0] == 1}")
+        else:
+            fast_branches(compiled, 1, False, constants, labels)
+            fast_branches(compiled, 1, True, constants, codes)
+        return "\n".join([
+            *header, *constants, "",
+            "def is_edible(mushroom):",
+            "    # Comestibilité d'un objet ayant une méthode get_attribute",
+            "    get = mushroom.get_attribute", *labels, "",
+            "def is_edible_values(values):",
+            "    # Comestibilité d'un tuple de codes, dans l'ordre de ATTRIBUTES (code = indice dans VOCABULARIES)",
+            *codes, "",
+            *footer,
+        ])
+    children = tuple(tuple(compiled.children_[compiled.offsets_[node]:compiled.offsets_[node + 1]])
+                     for node in range(len(compiled.features_)))
+    return "\n".join([
+        *header,
+        "# Noeud n : attribut FEATURES[n] (-1 pour une feuille de comestibilité LABELS[n]), enfant du code c : _CHILDREN[n][c]",
+        f"FEATURES = {tuple(compiled.features_)!r}",
+        f"LABELS = {tuple(label == 1 for label in compiled.labels_)!r}",
+        f"_CHILDREN = {children!r}",
+        "_LOOKUPS = tuple({VOCABULARIES[FEATURES[node]][code]: child for code, child in enumerate(table) if child >= 0}",
+        "                 for node, table in enumerate(_CHILDREN)) # Valeur -> enfant de chaque noeud",
+        "",
+        "def is_edible(mushroom):",
+        "    # Comestibilité d'un objet ayant une méthode get_attribute (False pour une valeur inconnue)",
+        "    get, node, position = mushroom.get_attribute, 0, FEATURES[0]",
+        "    while position >= 0:",
+        "        node = _LOOKUPS[node].get(get(ATTRIBUTES[position]), -1)",
+        "        if node < 0:",
+        "            return False",
+        "        position = FEATURES[node]",
+        "    return LABELS[node]",
+        "",
+        "def is_edible_values(values):",
+        "    # Comestibilité d'un tuple de codes, dans l'ordre de ATTRIBUTES (code = indice dans VOCABULARIES)",
+        "    node, position = 0, FEATURES[0]",
+        "    while position >= 0:",
+        "        table, code = _CHILDREN[node], values[position]",
+        "        node = table[code] if 0 <= code < len(table) else -1",
+        "        if node < 0:",
+        "            return False",
+        "        position = FEATURES[node]",
+        "    return LABELS[node]",
+        "",
+        *footer,
+    ])
+
+def to_python(dt: Node, path: str, fast: bool=False, dataset: Dataset=None):
     # Fonction qui crée un script python
-    script = "from project import *\n\ndef is_edible(mushroom: Mushroom):\n"
-    # Importation du fichier et création de la fonction
-    script += to_python_r(PythonScript(dt)) # Appel à la fonction récursive
-    script += "    else:\n" + "    "*(2) + "return False"
-    # Ajout de la condition pour les feuilles non comestibles
+    # fast : module autonome avec ensembles précalculés et variante sur codes (voir to_python_fast)
+    if fast:
+        with open(path, "w", encoding='UTF-8') as file:
+            file.write(to_python_fast(dt, dataset))
+        return
     with open(path, "w") as file: # Ouverture du fichier
-        file.write(script) # Écriture du script
+        writer = Writer(file) # Écriture du script au fur et à mesure
+        writer.write("from project import *\n\ndef is_edible(mushroom: Mushroom):\n")
+        # Importation du fichier et création de la fonction
+        to_python_r(PythonScript(dt), writer) # Appel à la fonction récursive
+        writer.write("    else:\n" + "    "*(2) + "return False")
+        # Ajout de la condition pour les feuilles non comestibles
 
 def main(argv, argc):
     # Fonction principale "test"
     path1 = "mushrooms.csv" if argc < 2 else argv[1]
     path2 = "decision_tree.py" if argc < 3 else argv[2]
-    mushrooms = load_dataset(path1)
+    mushrooms = load_dataset(path1, cache=True)
     dt = build_decision_tree(mushrooms)
     display(dt)
     print()
     boolean_tree(dt)
     to_python(dt, path2)
 
+def cross_validation_main(argv, argc):
+    # Fonction principale de la validation croisée : project.py cv [csv] [plis] [processus]
+    path = "mushrooms.csv" if argc < 2 else argv[1]
+    folds = 10 if argc < 3 else int(argv[2])
+    processes = None if argc < 4 else int(argv[3])
+    report = cross_validate(load_dataset(path, cache=True), folds, processes)
+    for result in report["folds"]: # Résultats de chaque pli
+        print(f"Pli {result['fold']}: précision {result['accuracy']:.4f}, "
+              f"construction {result['build_seconds']:.3f} s, prédiction {result['predict_seconds']:.3f} s")
+    print(f"Précision moyenne : {report['accuracy']:.4f}")
+    print(f"Matrice de confusion : {report['confusion']}")
+    print(f"Durée totale : {report['seconds']:.3f} s")
+    return report
+
+def serve_main(argv, argc):
+    # Fonction principale du serveur de prédiction : project.py serve [csv ou modèle] [port]
+    path = "mushrooms.csv" if argc < 2 else argv[1]
+    port = 8765 if argc < 3 else int(argv[2])
+    if path.endswith(".model"): # Modèle enregistré par save_model
+        server = ScoringServer(load_model(path))
+    else:
+        mushrooms = load_dataset(path, cache=True)
+        server = ScoringServer(build_decision_tree(mushrooms), mushrooms)
+    async def run():
+        print(f"Serveur de prédiction sur 127.0.0.1:{await server.start(port=port)}")
+        await server.server.serve_forever()
+    asyncio.run(run())
+
 if __name__ == "__main__":
-    main(sys.argv, len(sys.argv))
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "cv": # Validation croisée
+        cross_validation_main(sys.argv[1:], len(sys.argv) - 1)
+    elif len(sys.argv) > 1 and sys.argv[1] == "serve": # Serveur de prédiction
+        serve_main(sys.argv[1:], len(sys.argv) - 1)
+    else:
+        main(sys.argv, len(sys.argv))
\ No newline at end of file
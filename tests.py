@@ -1,4 +1,4 @@
-import unittest
+import asyncio, contextlib, csv, io, json, os, sys, tempfile, unittest
 from project import *
 
 class TestMushroomDataLoading(unittest.TestCase):
@@ -27,9 +27,13 @@ def make_mushroom(attributes):
         ret.add_attribute(k, v)
     return ret
 
+def shape(node):
+    # Structure complète d'un arbre, ordre des arêtes compris
+    return node.criterion_ if node.is_leaf() else (node.criterion_, [(e.get_label(), shape(e.get_child())) for e in node.edges_])
+
 class TestBuildTree(unittest.TestCase):
     def setUp(self):
-        self.test_tree_root = build_decision_tree(load_dataset('mushrooms.csv'))
+        self.test_tree_root = build_decision_tree(load_dataset('mushrooms.csv', cache=True))
 
     def test_tree_main_attribute(self):
         self.assertEqual(self.test_tree_root.criterion_, 'odor', "Le premier critère de division doit être 'odor'")
@@ -45,11 +49,24 @@ class TestBuildTree(unittest.TestCase):
         self.assertTrue(is_edible(root, make_mushroom({'odor': 'Almond'})))
         self.assertFalse(is_edible(root, make_mushroom({'odor': 'None', 'spore-print-color': 'Green'})))
 
+    def test_object_model(self):
+    # Test des objets sans dictionnaire : schéma partagé et arêtes en listes parallèles
+        m1, m2 = make_mushroom({'odor': 'Almond', 'cap-shape': 'Bell'}), make_mushroom({'odor': 'None', 'cap-shape': 'Flat'})
+        self.assertIs(m1.schema_, m2.schema_) # Mêmes attributs dans le même ordre
+        self.assertEqual(m1.values_, ('Almond', 'Bell'))
+        m1.add_attribute('odor', 'Anise')
+        self.assertEqual((m1.get_attribute('odor'), m1.get_attributes()), ('Anise', ['odor', 'cap-shape']))
+        self.assertFalse(hasattr(m1, '__dict__') or hasattr(self.test_tree_root, '__dict__'))
+        root = self.test_tree_root
+        self.assertEqual([e.get_label() for e in root.edges_], root.labels_)
+        self.assertIs(root.get_child('Almond'), root.edges_[root.labels_.index('Almond')].get_child())
+        self.assertIsNone(root.get_child('Unknown'))
+
 class PersonnalTestsPart1(unittest.TestCase):
 # Classe contenant les tests de la 1ère partie du projet
 # Les tests sont effectués sur les fonctions de calcul d'entropie et d'information gain
     def setUp(self):
-        self.mushrooms = load_dataset('mushrooms.csv')
+        self.mushrooms = load_dataset('mushrooms.csv', cache=True)
         self.test_tree_root = build_decision_tree(self.mushrooms)
     
     def test_entropy(self):
@@ -76,7 +93,7 @@ class PersonnalTestsPart2(unittest.TestCase):
 # Classe contenant les tests de la 2ème partie du projet
 # Les tests sont effectués sur les fonctions d'affichage de l'arbre de décision et de génération de code Python
     def setUp(self):
-        self.mushrooms = load_dataset('mushrooms.csv')
+        self.mushrooms = load_dataset('mushrooms.csv', cache=True)
         self.test_tree_root = build_decision_tree(self.mushrooms)
         self.path = "decision_tree.py"
     
@@ -123,10 +140,40 @@ class PersonnalTestsPart2(unittest.TestCase):
         self.assertTrue(is_edible(make_mushroom({'odor': 'Almond'}))) # Champignon comestible
         self.assertFalse(is_edible(make_mushroom({'odor': 'None', 'spore-print-color': 'Green'}))) # Champignon non comestible
 
+    def test_to_python_fast(self):
+    # Test du module généré en mode rapide
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'decision_tree_fast.py')
+            to_python(self.test_tree_root, path, fast=True, dataset=self.mushrooms)
+            namespace = {}
+            with open(path, encoding='UTF-8') as file:
+                script = file.read()
+            self.assertNotIn('import', script) # Module autonome
+            self.assertNotIn('while', script) # Arbre peu profond : tests en ligne droite
+            exec(script, namespace)
+        self.assertTrue(namespace['is_edible'](make_mushroom({'odor': 'Almond'})))
+        self.assertFalse(namespace['is_edible'](make_mushroom({'odor': 'None', 'spore-print-color': 'Green'})))
+        rows = list(zip(*self.mushrooms.columns_)) # Tuples des codes des colonnes
+        expected = [m.is_edible() for m in self.mushrooms]
+        self.assertEqual(namespace['is_edible_batch'](rows), expected)
+        self.assertEqual([namespace['is_edible_values'](namespace['encode'](m)) for m in self.mushrooms], expected)
+
+    def test_streaming_exports(self):
+    # Test des exports écrits directement dans un fichier
+        tree = self.test_tree_root
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            tree_d, tree_bt = display(tree, echo=False), boolean_tree(tree, echo=False)
+        self.assertEqual(output.getvalue(), "") # Rien n'est affiché
+        file_d, file_bt = io.StringIO(), io.StringIO()
+        self.assertIsNone(display(tree, file_d))
+        self.assertIsNone(boolean_tree(tree, file_bt))
+        self.assertEqual(file_d.getvalue(), tree_d) # Même texte qu'en mémoire
+        self.assertEqual(file_bt.getvalue(), tree_bt)
+
 class TestBooleanTree(unittest.TestCase):
 # Classe contenant les tests de la génération de l'arbre booléen
     def setUp(self):
-        self.mushrooms = load_dataset('mushrooms.csv')
+        self.mushrooms = load_dataset('mushrooms.csv', cache=True)
         self.tree = build_decision_tree(self.mushrooms)
         self.boolean_tree = boolean_tree(self.tree)
     
@@ -176,5 +223,327 @@ class TestBooleanTree(unittest.TestCase):
             else:
                 stack[next_c].extend(suite) # Ajout des éléments de la liste au dictionnaire
 
+class TestDataset(unittest.TestCase):
+# Classe contenant les tests du dataset encodé en colonnes
+    def setUp(self):
+        self.mushrooms = load_dataset('mushrooms.csv', cache=True)
+
+    def test_columns(self):
+    # Test de l'encodage des colonnes
+        self.assertEqual(len(self.mushrooms), 8124) # Nombre de champignons
+        odor = self.mushrooms.column('odor')
+        vocabulary = self.mushrooms.vocabulary('odor')
+        self.assertEqual(len(odor), len(self.mushrooms)) # Une valeur par champignon
+        self.assertEqual([vocabulary[c] for c in odor[:3]], ['Pungent', 'Almond', 'Anise']) # Décodage des valeurs
+        self.assertEqual(self.mushrooms.count_edible(), sum(m.is_edible() for m in self.mushrooms))
+
+    def test_views(self):
+    # Test des vues et de la conversion des listes de champignons
+        edible = [m for m in self.mushrooms if m.is_edible()]
+        view = as_dataset(edible)
+        self.assertIs(view.columns_, self.mushrooms.columns_) # Les colonnes sont partagées
+        self.assertEqual(len(view), len(edible))
+        mushrooms = [make_mushroom({'odor': 'Almond', 'cap-shape': 'Bell'}), make_mushroom({'odor': 'Foul', 'cap-shape': 'Bell'})]
+        dataset = as_dataset(mushrooms) # Conversion d'une liste de Mushroom
+        self.assertEqual(dataset[1].get_attribute('odor'), 'Foul')
+        self.assertEqual(get_sub_attributes(dataset, 'cap-shape'), {'Bell'})
+        head = self.mushrooms[:100] # Tranche : vue, comme une liste de champignons
+        self.assertEqual(len(head), 100)
+        self.assertEqual([m.get_attribute('odor') for m in head[1:3]], ['Almond', 'Anise'])
+        self.assertEqual(shape(build_decision_tree(head)), shape(build_decision_tree(as_dataset(list(head)))))
+        self.assertEqual(head[-1].get_attribute('odor'), self.mushrooms[99].get_attribute('odor'))
+    def test_split_gains(self):
+    # Test des gains calculés à partir des tables de contingence
+        gains = get_split_gains(self.mushrooms, ['odor', 'cap-shape'])
+        self.assertEqual(gains[0][0], get_information_gain(self.mushrooms, 'odor'))
+        totals, edibles = gains[0][1] # Table de contingence de 'odor'
+        code = self.mushrooms.vocabulary('odor').index('Almond')
+        self.assertEqual(totals[code], edibles[code]) # Les champignons à l'odeur 'Almond' sont tous comestibles
+        self.assertEqual(sum(totals.values()), len(self.mushrooms))
+        rows, odor = memoryview(array('l', range(len(self.mushrooms)))), self.mushrooms.column('odor')
+        partition_rows(self.mushrooms, rows, 10, 5000, self.mushrooms.positions_['odor'], Counter(odor[10:5000]))
+        self.assertEqual(list(rows[10:5000]), sorted(range(10, 5000), key=odor.__getitem__)) # Groupes dans l'ordre des codes, stable
+        self.assertEqual(list(rows[:10]) + list(rows[5000:]), list(range(10)) + list(range(5000, len(self.mushrooms))))
+    def test_build_on_indices(self):
+    # Test de la construction de l'arbre sur des indices partagés
+        rows = [m for m in self.mushrooms if m.get_attribute('odor') == 'None']
+        root = build_decision_tree(rows)
+        self.assertEqual(root.criterion_, get_best_attribute(rows)) # Même critère que get_best_attribute
+        self.assertEqual(self.mushrooms.rows_, None) # Le dataset n'est pas modifié
+        edible, poisonous = Mushroom(True), Mushroom(False)
+        for mushroom in (edible, poisonous): # Deux champignons identiques de classes différentes
+            mushroom.add_attribute('odor', 'None')
+        root = build_decision_tree([edible, poisonous, edible])
+        self.assertTrue(root.edges_[0].get_child().is_leaf()) # Feuille majoritaire au lieu d'une récursion infinie
+        self.assertTrue(is_edible(root, edible))
+        root = build_decision_tree([edible, poisonous]) # Égalité : pas comestible par prudence
+        self.assertFalse(is_edible(root, edible))
+
+    def test_deep_tree(self):
+    # Test d'un arbre plus profond que la limite de récursion : construction et exports sans récursion
+        size = 150 # La ligne i ne diffère de la seule ligne comestible que par l'attribut i : une ligne séparée par niveau
+        rows = [['edible'] + [f'a{j}' for j in range(size)], ['Yes'] + ['x'] * size]
+        rows += [['No'] + ['y' if j == i else 'x' for j in range(size)] for i in range(size)]
+        dataset = Dataset(rows[0][1:])
+        dataset.extend(rows[1:])
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(100)
+        try:
+            root = build_decision_tree(dataset)
+            wide = build_decision_tree(dataset, breadth_first=True)
+            texts = [display(root, echo=False), boolean_tree(root, echo=False)]
+            with tempfile.TemporaryDirectory() as directory:
+                to_python(root, os.path.join(directory, 'deep.py'))
+            fast = to_python_fast(root, dataset)
+            incremental = IncrementalTree(dataset)
+            self.assertEqual(incremental.add([['Yes'] + ['x'] * size]), 0) # Mise à jour jusqu'à la feuille la plus profonde
+        finally:
+            sys.setrecursionlimit(limit)
+        namespace = {}
+        self.assertIn('_CHILDREN', fast) # Plus de FAST_MAX_DEPTH niveaux : module en tables, pas d'imbrication
+        exec(fast, namespace)
+        self.assertEqual(namespace['is_edible_batch'](zip(*dataset.columns_)), [row.is_edible() for row in dataset])
+        self.assertGreater(texts[0].count('\n' + ' ' * 400), 0) # Plus de 100 niveaux
+        self.assertEqual(display(wide, echo=False), texts[0]) # Même arbre en largeur
+        self.assertEqual(display(incremental.root, echo=False), texts[0])
+        self.assertTrue(all(is_edible(root, row) == row.is_edible() for row in dataset))
+
+    def test_cache(self):
+    # Test du cache binaire et de son invalidation
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'mushrooms.csv')
+            with open('mushrooms.csv', encoding='UTF-8') as source, open(path, 'w', encoding='UTF-8') as file:
+                file.writelines(source.readlines()[:101])
+            dataset = load_dataset(path, cache=True)
+            self.assertTrue(os.path.exists(path + '.cache')) # Cache écrit au premier chargement
+            cached = load_dataset(path, cache=True)
+            self.assertIsInstance(cached.edible_, memoryview) # Colonnes projetées depuis le fichier
+            self.assertEqual(cached.columns_, dataset.columns_)
+            self.assertEqual(cached[2].get_attribute('odor'), 'Anise')
+            row = dataset[1]
+            with open(path, 'a', encoding='UTF-8') as file: # Modification du CSV
+                file.write(','.join(['Yes'] + [row.get_attribute(a) for a in row.get_attributes()]) + '\n')
+            self.assertEqual(len(load_dataset(path, cache=True)), 101) # Cache périmé : le CSV est relu
+            self.assertIsInstance(load_dataset(path, cache=True).edible_, memoryview) # Cache réécrit
+            with open(path + '.cache', 'r+b') as file: # Cache tronqué
+                file.truncate(os.path.getsize(path + '.cache') - 300)
+            reread = load_dataset(path, cache=True)
+            self.assertNotIsInstance(reread.edible_, memoryview) # Le CSV est relu
+            self.assertEqual(reread.columns_, load_dataset(path).columns_)
+            missing = os.path.join(directory, 'missing', 'mushrooms.cache') # Cache impossible à écrire
+            self.assertEqual(len(load_dataset(path, cache=missing)), 101)
+            self.assertFalse([name for name in os.listdir(directory) if name.endswith('.tmp')]) # Aucun fichier temporaire
+
+    def test_parallel_build(self):
+    # Test de la construction parallèle : même arbre que la construction en série
+        serial = build_decision_tree(self.mushrooms)
+        parallel = build_decision_tree(self.mushrooms, processes=2, min_rows=1000)
+        self.assertEqual(shape(parallel), shape(serial))
+
+    def test_wide_column(self):
+    # Test d'une colonne de plus de 65536 valeurs : codes sur 4 octets, cache et mémoire partagée compris
+        rows = [['edible', 'id', 'size']] + [['Yes' if n % 3 == 0 else 'No', f'v{n}', 'ab'[n % 2]] for n in range(70000)]
+        dataset = Dataset(rows[0][1:])
+        dataset.extend(rows[1:60001])
+        dataset.append(False, ['v60000', 'a'])
+        dataset.extend(rows[60002:])
+        self.assertEqual(dataset.formats(), 'IH')
+        self.assertEqual(dataset[69999].get_attribute('id'), 'v69999')
+        chunks = list(encode_chunks(rows, chunk_size=40000)) # Deuxième morceau directement en "I"
+        self.assertEqual(chunks[1].formats(), 'IH')
+        serial = build_decision_tree(dataset)
+        self.assertEqual(shape(build_decision_tree(dataset, processes=2, min_rows=1000)), shape(serial))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'wide.cache')
+            write_cache(dataset, path)
+            self.assertEqual(list(read_cache(path).column('id')[-2:]), [69998, 69999])
+
+    def test_trace(self):
+    # Test de l'instrumentation de la construction
+        with tempfile.TemporaryDirectory() as directory:
+            profile = os.path.join(directory, 'build.prof')
+            with Trace(profile) as trace:
+                root = build_decision_tree(self.mushrooms, trace=trace)
+            self.assertTrue(os.path.exists(profile)) # Statistiques cProfile écrites
+        nodes = trace.to_dict()['nodes']
+        self.assertEqual(nodes[0]['criterion'], root.criterion_) # Racine en premier
+        self.assertEqual(nodes[0]['rows'], len(self.mushrooms))
+        self.assertEqual(nodes[0]['gain'], get_information_gain(self.mushrooms, 'odor'))
+        self.assertEqual(trace.calls['build_node'], len(nodes))
+        self.assertEqual(json.loads(trace.to_json())['calls']['partition_rows'], len(nodes))
+
+    def test_split_cache(self):
+    # Test de la cache des tables de contingence
+        expected = shape(build_decision_tree(self.mushrooms))
+        with SplitCache(1000) as cache:
+            self.assertEqual(shape(build_decision_tree(self.mushrooms)), expected)
+            misses = cache.misses
+            self.assertEqual(shape(build_decision_tree(self.mushrooms)), expected) # Deuxième construction servie par la cache
+            self.assertEqual(cache.misses, misses)
+            self.assertGreater(cache.hits, 0)
+        with SplitCache(10) as cache:
+            build_decision_tree(self.mushrooms)
+            self.assertEqual(len(cache.entries), 10) # Taille bornée
+            self.assertGreater(cache.evictions, 0)
+        self.assertIsNone(set_split_cache(None)) # Cache désactivée à la sortie du bloc
+
+    def test_cross_validate(self):
+    # Test de la validation croisée en série et en parallèle
+        sample = self.mushrooms.take(range(0, len(self.mushrooms), 20))
+        serial = cross_validate(sample, 4, processes=1)
+        parallel = cross_validate(sample, 4, processes=2)
+        self.assertEqual(sum(fold['test'] for fold in serial['folds']), len(sample)) # Chaque ligne testée une fois
+        self.assertEqual(serial['confusion'], parallel['confusion']) # Mêmes plis, mêmes arbres
+        self.assertEqual(serial['accuracy'], parallel['accuracy'])
+        self.assertEqual(sum(serial['confusion'].values()), len(sample))
+        with SplitCache(100000) as cache: # Tables de chaque pli réutilisées par les arbres des autres plis
+            cached = cross_validate(sample, 4, processes=1)
+            self.assertGreater(cache.hits, cache.misses)
+            misses = cache.misses
+            parallel = cross_validate(sample, 4, processes=2)
+            self.assertGreater(cache.misses, misses) # Compteurs des processus remontés
+        self.assertEqual((cached['confusion'], parallel['confusion']), (serial['confusion'], serial['confusion']))
+        with self.assertRaises(ValueError):
+            cross_validate(sample, 1)
+
+    def test_chunks(self):
+    # Test de la lecture et de la prédiction par morceaux
+        chunks = list(read_chunks('mushrooms.csv', 3000))
+        self.assertEqual([len(chunk) for chunk in chunks], [3000, 3000, 2124])
+        self.assertIs(chunks[0].codes_, chunks[-1].codes_) # Vocabulaire partagé entre les morceaux
+        self.assertEqual(chunks[2][0].get_attribute('odor'), self.mushrooms[6000].get_attribute('odor'))
+        self.assertEqual(load_dataset('mushrooms.csv', 100).columns_, self.mushrooms.columns_)
+        tree = build_decision_tree(self.mushrooms)
+        predictions = array("B")
+        for chunk in is_edible_chunks(tree, 'mushrooms.csv', chunk_size=3000):
+            predictions.extend(chunk)
+        self.assertEqual(predictions, self.mushrooms.edible_)
+
+class TestCompiledTree(unittest.TestCase):
+# Classe contenant les tests de l'arbre compilé en tableaux plats
+    def setUp(self):
+        self.mushrooms = load_dataset('mushrooms.csv', cache=True)
+        self.tree = build_decision_tree(self.mushrooms)
+
+    def test_predictions(self):
+    # Test des prédictions de l'arbre compilé
+        compiled = compile_tree(self.tree, self.mushrooms)
+        self.assertTrue(all(compiled.is_edible(m) == m.is_edible() for m in self.mushrooms)) # Lignes du dataset
+        other = as_dataset([make_mushroom({'odor': 'Almond'})])
+        self.assertTrue(is_edible_batch(self.tree, other)[0])
+        self.assertEqual(other.vocabulary('odor'), ['Almond']) # Vocabulaire du dataset non modifié
+        compiled = compile_tree(self.tree) # Sans dataset, le vocabulaire vient de l'arbre
+        self.assertTrue(compiled.is_edible(make_mushroom({'odor': 'Almond'})))
+        self.assertFalse(compiled.is_edible(make_mushroom({'odor': 'None', 'spore-print-color': 'Green'})))
+
+    def test_unknown_value(self):
+    # Test de la politique des valeurs inconnues
+        mushroom = make_mushroom({'odor': 'Unknown'})
+        self.assertFalse(is_edible(self.tree, mushroom)) # Plus de boucle infinie
+        self.assertTrue(is_edible(self.tree, mushroom, True))
+        self.assertTrue(compile_tree(self.tree, default=True).is_edible(mushroom))
+        with self.assertRaises(ValueError):
+            compile_tree(self.tree, default=None).is_edible(mushroom)
+
+    def test_batch(self):
+    # Test de la prédiction par lots
+        leaf_hits = Counter()
+        predictions = is_edible_batch(self.tree, self.mushrooms, leaf_hits=leaf_hits)
+        self.assertEqual(list(predictions), [m.is_edible() for m in self.mushrooms]) # L'arbre classe parfaitement ses données
+        self.assertEqual(sum(leaf_hits.values()), len(self.mushrooms)) # Chaque ligne arrive dans une feuille
+        rows = [['edible', 'odor', 'spore-print-color'], ['', 'Almond', 'Green'], ['', 'None', 'Green'], ['', 'Unknown', 'Green']]
+        self.assertEqual(list(is_edible_batch(self.tree, rows, chunk_size=2)), [1, 0, 0]) # Lignes CSV
+        mushrooms = [make_mushroom({'odor': 'None', 'spore-print-color': 'Green'}), make_mushroom({'odor': 'Almond'})]
+        self.assertEqual(list(is_edible_batch(self.tree, mushrooms)), [is_edible(self.tree, m) for m in mushrooms]) # Attributs différents
+        rows = [['edible', 'odor', 'spore-print-color'], ['', 'None', 'White']] # Attribut testé absent de toutes les lignes
+        mushrooms = [make_mushroom({'odor': 'None', 'spore-print-color': 'White'})]
+        self.assertEqual(list(is_edible_batch(self.tree, rows)), [0]) # default=False
+        self.assertEqual(list(is_edible_batch(self.tree, mushrooms, default=True)), [True])
+        with self.assertRaises(ValueError):
+            is_edible_batch(self.tree, mushrooms, default=None)
+
+    def test_model(self):
+    # Test de l'enregistrement et du chargement d'un modèle
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tree.model')
+            save_model(self.tree, path, self.mushrooms)
+            model = load_model(path)
+            self.assertIsInstance(model.features_, memoryview) # Tableaux projetés depuis le fichier
+            self.assertTrue(all(model.is_edible(m) == m.is_edible() for m in self.mushrooms))
+            self.assertEqual(display(model.to_node(), echo=False), display(self.tree, echo=False)) # Aller-retour exact
+            with open(path, 'r+b') as file:
+                file.truncate(os.path.getsize(path) - 16) # Modèle tronqué
+            with self.assertRaises(ValueError):
+                load_model(path)
+            with open(path, 'r+b') as file:
+                file.write(b'X')
+            with self.assertRaises(ValueError):
+                load_model(path)
+
+    def test_server(self):
+    # Test du serveur de prédiction : formats, regroupement des requêtes concurrentes et compteurs
+        rows = [','.join(m.get_attribute(a) for a in self.mushrooms.attributes_) for m in self.mushrooms.take(range(200))]
+        expected = ['Yes' if m.is_edible() else 'No' for m in self.mushrooms.take(range(200))]
+        async def scenario():
+            server = ScoringServer(self.tree, self.mushrooms, max_delay=0.01)
+            port = await server.start()
+            async def client(lines):
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(b''.join((line if isinstance(line, bytes) else line.encode()) + b'\n' for line in lines)) # Lignes envoyées à la suite
+                answers = [(await reader.readline()).decode().strip() for _ in lines]
+                writer.close()
+                return answers
+            answers = await asyncio.gather(client(rows[:100]), client(rows[100:]))
+            others = await client(['{"odor": "Almond"}', '[{"odor": "None", "spore-print-color": "Green"}, {"odor": "?"}]',
+                                   'Bell,Flat', '[1]'])
+            stats = json.loads((await client(['STATS']))[0])
+            await server.close()
+            strict = ScoringServer(self.tree, self.mushrooms, default=None, max_delay=0.01, limit=1000)
+            port = await strict.start()
+            checks = await asyncio.gather(client(['{"odor": "Almond"}']), client(['{"odor": "Bogus"}']), # Même lot
+                                          client(['{"odor": "Almond", "spore-print-color": "Bogus"}', 'x' * 5000, rows[0], '{"odor": "None"}',
+                                                  b'\xff\xfe', rows[1]]))
+            await strict.close()
+            return answers[0] + answers[1], others, stats, [answer for check in checks for answer in check], strict.batches
+        answers, others, stats, checks, batches = asyncio.run(scenario())
+        self.assertEqual(answers, expected)
+        self.assertEqual(others[:2], ['{"edible": true}', '{"edible": [false, false]}']) # Valeur inconnue : non comestible
+        self.assertTrue(all('error' in json.loads(answer) for answer in others[2:]))
+        self.assertEqual((stats['requests'], stats['rows'], stats['errors']), (202, 203, 2))
+        self.assertLess(stats['batches'], 200) # Requêtes regroupées en lots
+        self.assertEqual(checks[:2], ['{"edible": true}', '{"error": "Valeur inconnue \'Bogus\' pour l\'attribut \'odor\'"}'])
+        self.assertEqual(checks[2], '{"edible": true}') # Valeur inconnue d'un attribut non testé sur le chemin
+        self.assertIn('error', json.loads(checks[3])) # Ligne trop longue : erreur, la connexion continue
+        self.assertEqual(checks[4], expected[0])
+        self.assertEqual(checks[5], '{"error": "Valeur absente pour l\'attribut \'spore-print-color\'"}')
+        self.assertIn('error', json.loads(checks[6])) # Ligne qui n'est pas en UTF-8 : erreur, la connexion continue
+        self.assertEqual(checks[7], expected[1])
+        self.assertLess(batches, 4)
+
+class TestIncrementalTree(unittest.TestCase):
+# Classe contenant les tests de la mise à jour incrémentale de l'arbre
+    def test_add_rows(self):
+        with open('mushrooms.csv', encoding='UTF-8') as file:
+            rows = list(csv.reader(file))
+        dataset = Dataset(rows[0][1:])
+        dataset.extend(rows[1:101]) # Arbre initial sur 100 champignons
+        tree = IncrementalTree(dataset)
+        for start in range(101, len(rows), 2000): # Ajout par lots
+            tree.add(rows[start:start + 2000])
+            self.assertEqual(shape(tree.root), shape(build_decision_tree(tree.dataset))) # Même arbre qu'une reconstruction
+        self.assertEqual(tree.root.stats_[:2], [len(rows) - 1, tree.dataset.count_edible()]) # Effectifs de la racine
+        self.assertEqual(tree.add([]), 0)
+
+class TestBenchmark(unittest.TestCase):
+# Classe contenant les tests du script de mesure des performances
+    def test_run(self):
+        import bench
+        with contextlib.redirect_stderr(io.StringIO()):
+            results = bench.run('mushrooms.csv', [2], [3], 1, ['build_decision_tree'])
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['rows'], 2 * 8124) # Lignes répétées
+        self.assertGreater(results[0]['peak_bytes'], 0)
+        json.dumps(results) # Résultats exportables en JSON
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file